@@ -0,0 +1,90 @@
+"""Benchmark the catalog extraction on saved pages.
+
+Save a listing and a product detail page first, e.g.
+
+    curl -o listing.html 'https://www.cactus.md/ro/catalogue/electronice/kompyuternaya-tehnika/noutbuki/'
+    curl -o detail.html 'https://www.cactus.md/ro/catalogue/electronice/kompyuternaya-tehnika/noutbuki/<product>/'
+
+and run `python bench_extract.py listing.html detail.html`.
+"""
+import argparse
+import time
+
+from extract import BACKENDS, extract_listing, extract_product_id
+
+try:
+    from bs4 import BeautifulSoup
+except ImportError:
+    BeautifulSoup = None
+
+
+def bs4_listing(html_content):
+    soup = BeautifulSoup(html_content, 'html.parser')
+    pills = []
+    for product in soup.find_all("div", class_="catalog__pill"):
+        price_elem = product.find("div", class_="catalog__pill__controls__price")
+        pills.append({
+            "title": product.find("span", class_="catalog__pill__text__title").text,
+            "price": price_elem.text if price_elem else None,
+            "link": product.find("a")["href"],
+        })
+    return pills
+
+
+def bs4_product_id(html_content):
+    soup = BeautifulSoup(html_content, 'html.parser')
+    id_elem = soup.find("div", class_="catalog__item__id")
+    return id_elem.text if id_elem else None
+
+
+def chunked(content, chunk_size):
+    """Split the page into socket sized chunks, like the streaming fetch feeds them"""
+    return [content[idx:idx + chunk_size] for idx in range(0, len(content), chunk_size)]
+
+
+def measure(function, content, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function(content)
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("listing", help="saved listing page")
+    parser.add_argument("detail", help="saved product detail page")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--chunk-size", type=int, default=16384)
+    args = parser.parse_args()
+
+    with open(args.listing, "rb") as f:
+        listing = f.read()
+    with open(args.detail, "rb") as f:
+        detail = f.read()
+    listing_chunks = chunked(listing, args.chunk_size)
+    detail_chunks = chunked(detail, args.chunk_size)
+
+    cases = []
+    if BeautifulSoup is not None:
+        listing_text = listing.decode("utf-8", errors="ignore")
+        detail_text = detail.decode("utf-8", errors="ignore")
+        cases.append(("bs4 full document", "listing", bs4_listing, listing_text))
+        cases.append(("bs4 full document", "detail", bs4_product_id, detail_text))
+    for backend in BACKENDS:
+        try:
+            extract_listing(b"", backend)
+        except ImportError:
+            print(f"skipping {backend}, it is not installed")
+            continue
+        cases.append((f"stream {backend}", "listing", lambda chunks, b=backend: extract_listing(chunks, b), listing_chunks))
+        cases.append((f"stream {backend}", "detail", lambda chunks, b=backend: extract_product_id(chunks, b), detail_chunks))
+
+    print(f"{'parser':<24}{'page':<10}{'ms/page':>10}  result")
+    for name, page, function, content in cases:
+        seconds, result = measure(function, content, args.repeat)
+        summary = f"{len(result)} pills" if isinstance(result, list) else repr(result)
+        print(f"{name:<24}{page:<10}{seconds * 1000:>10.3f}  {summary}")
+
+
+if __name__ == "__main__":
+    main()
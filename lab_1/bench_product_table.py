@@ -0,0 +1,92 @@
+"""Benchmark process_list_of_products on dicts (task_9) against the columnar ProductTable.
+
+    python bench_product_table.py --sizes 10000,100000,1000000
+
+"kernel x" compares the dict path with the vectorized work alone, which is only the gain
+when the products are already held in a ProductTable. "end-to-end x" also counts building
+the table from the dict layout and turning the result back into it.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import task_9
+import product_table
+from product_table import ProductTable
+from exchange_rates import ExchangeRateProvider
+
+# MDL per unit, fixed so runs are comparable and need no network
+BENCH_RATES = {"MDL": 1.0, "EUR": 19.24, "USD": 17.71, "RON": 3.87}
+
+
+def generate_data(size, seed=0):
+    rng = random.Random(seed)
+    return {
+        "products": {
+            product_id: {
+                "name": f"Laptop {product_id}",
+                "price": {"MDL": float(rng.randint(5000, 120000))},
+                "specifications": "2023",
+            }
+            for product_id in range(100000, 100000 + size)
+        }
+    }
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def run(args, rates):
+    print(
+        f"{'products':>10}{'dict s':>10}{'build table s':>15}{'vectorized s':>14}{'kernel x':>10}"
+        f"{'with dicts s':>14}{'end-to-end x':>14}  same result"
+    )
+    for size in (int(size) for size in args.sizes.split(",")):
+        data = generate_data(size)
+        dict_seconds, expected = timed(
+            task_9.process_list_of_products, generate_data(size), args.min_price, args.max_price, args.currency, rates
+        )
+        build_seconds, table = timed(ProductTable.from_data, data)
+        # the convert / filter / sum work alone, then the same call including the rebuild of the dict layout
+        vectorized_seconds, _ = timed(
+            product_table.filter_and_sum,
+            ProductTable.from_data(data), args.min_price, args.max_price, args.currency, rates=rates,
+        )
+        columnar_seconds, result = timed(
+            product_table.process_list_of_products,
+            table, args.min_price, args.max_price, args.currency, rates=rates,
+        )
+        expected_statistics = expected.pop("product_statistics")
+        result_statistics = result.pop("product_statistics")
+        same = result == expected and result_statistics["sum"] == expected_statistics["sum"]
+        print(
+            f"{size:>10}{dict_seconds:>10.3f}{build_seconds:>15.3f}{vectorized_seconds:>14.4f}"
+            f"{dict_seconds / vectorized_seconds:>9.1f}x{columnar_seconds:>14.3f}"
+            f"{dict_seconds / (build_seconds + columnar_seconds):>13.2f}x  {same}"
+        )
+    print("kernel x assumes the data is already in columns, end-to-end x includes building the table from dicts")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--min-price", type=float, default=1000)
+    parser.add_argument("--max-price", type=float, default=2000)
+    parser.add_argument("--currency", default="EUR")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # a fixed table loaded before timing and never refreshed, so both implementations see the same rate
+        rates = ExchangeRateProvider(
+            cache_file=os.path.join(cache_dir, "exchange_rates.json"), ttl=float("inf"), fetch=lambda: dict(BENCH_RATES)
+        )
+        rates.refresh()
+        run(args, rates)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""End-to-end scraper throughput against the local fixture server, no network needed.
+
+    python bench_scraper.py --pages 20 --latency 0.02 --concurrency 1,4,8,16
+    python bench_scraper.py --fixtures fixtures --certfile cert.pem --keyfile key.pem --output bench_scraper.json
+
+Without --fixtures synthetic pages are generated. For every detail concurrency it
+runs the streaming pipeline and reports pages/s, products/s and the time spent in
+each stage, and the batch crawl_catalog for comparison.
+"""
+import argparse
+import json
+import time
+
+import pipeline
+import task_9
+from bench_serialization import environment
+from fixture_server import FixtureServer, generate_fixtures, load_fixtures
+from http_client import default_pool
+from rate_control import AIMDController
+
+
+class StageTimer:
+    """Wraps an iterator and adds up the time spent waiting for its items, upstream stages included"""
+
+    def __init__(self, iterator):
+        self.iterator = iterator
+        self.seconds = 0.0
+        self.items = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            item = next(self.iterator)
+        finally:
+            self.seconds += time.perf_counter() - start
+        self.items += 1
+        return item
+
+
+def run_pipeline(concurrency):
+    pages = StageTimer(pipeline.fetch_pages(pipeline.listing_paths()))
+    pills = StageTimer(pipeline.extract_pills(pages))
+    details = StageTimer(pipeline.fetch_details(pills, concurrency=concurrency))
+    products = StageTimer(pipeline.validate(details))
+    start = time.perf_counter()
+    data = pipeline.collect(products)
+    wall = time.perf_counter() - start
+    # every timer includes the stages before it, the differences are the time of each stage alone
+    stages = {
+        "fetch_pages": pages.seconds,
+        "extract_pills": pills.seconds - pages.seconds,
+        "fetch_details": details.seconds - pills.seconds,
+        "validate": products.seconds - details.seconds,
+        "sink": wall - products.seconds,
+    }
+    return wall, len(data["products"]), stages
+
+
+def run_crawl_catalog(concurrency):
+    start = time.perf_counter()
+    data = task_9.crawl_catalog(task_9.host, max_workers=concurrency)
+    wall = time.perf_counter() - start
+    # the batch crawl has no stages to wrap, only the total is measured
+    return wall, len(data["products"]), {}
+
+
+SCRAPERS = {"pipeline": run_pipeline, "crawl_catalog": run_crawl_catalog}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", help="fixture directory, synthetic pages are generated when omitted")
+    parser.add_argument("--pages", type=int, default=10, help="synthetic listing pages")
+    parser.add_argument("--products-per-page", type=int, default=24)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--bandwidth", type=int, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--certfile", help="run the server over HTTPS with this certificate")
+    parser.add_argument("--keyfile")
+    parser.add_argument("--concurrency", default="1,4,8,16", help="detail page fetches in flight")
+    parser.add_argument("--scrapers", default=",".join(SCRAPERS))
+    parser.add_argument("--adaptive", action="store_true", help="use --concurrency as the AIMD window limit")
+    parser.add_argument("--target-p95", type=float, default=2.0, help="latency the adaptive window backs off above")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.fixtures:
+        fixtures = load_fixtures(args.fixtures)
+    else:
+        fixtures = generate_fixtures(args.pages, args.products_per_page, args.seed)
+
+    results = []
+    print(f"{'scraper':<15}{'workers':>8}{'seconds':>9}{'pages/s':>9}{'products/s':>12}{'errors':>8}  stages")
+    for scraper in args.scrapers.split(","):
+        for concurrency in (int(concurrency) for concurrency in args.concurrency.split(",")):
+            # a fresh server per run so the seeded latency and errors repeat exactly
+            server = FixtureServer(
+                fixtures, latency=args.latency, jitter=args.jitter, bandwidth=args.bandwidth,
+                error_rate=args.error_rate, seed=args.seed, certfile=args.certfile, keyfile=args.keyfile,
+            )
+            with server:
+                default_pool.route(task_9.host, server.address, server.port, server.client_ssl_context())
+                if args.adaptive:
+                    default_pool.controller = AIMDController(max_window=concurrency, target_p95=args.target_p95)
+                try:
+                    wall, products, stages = SCRAPERS[scraper](concurrency)
+                finally:
+                    default_pool.unroute(task_9.host)
+                    controller, default_pool.controller = default_pool.controller, None
+            result = {
+                "scraper": scraper,
+                "concurrency": concurrency,
+                "seconds": wall,
+                "requests": server.requests,
+                "errors": server.errors,
+                "products": products,
+                "pages_per_second": server.requests / wall,
+                "products_per_second": products / wall,
+                "stage_seconds": stages,
+                "rate_control": controller.stats() if controller is not None else None,
+            }
+            results.append(result)
+            stage_summary = " ".join(f"{stage}={seconds:.3f}" for stage, seconds in stages.items())
+            if controller is not None:
+                stage_summary += f" window={controller.stats()['window']} backoffs={controller.backoffs}"
+            print(
+                f"{scraper:<15}{concurrency:>8}{wall:>9.3f}{result['pages_per_second']:>9.1f}"
+                f"{result['products_per_second']:>12.1f}{server.errors:>8}  {stage_summary}"
+            )
+
+    if args.output:
+        settings = {key: value for key, value in vars(args).items() if key != "output"}
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment(), "settings": settings, "results": results}, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
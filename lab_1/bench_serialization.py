@@ -0,0 +1,150 @@
+"""Benchmark the task_9 serialization formats on synthetic product catalogs.
+
+    python bench_serialization.py --sizes 10,1000,100000,1000000 --output bench_serialization.json
+
+For every format and catalog size it reports encode/decode time and throughput,
+peak traced memory and output size. The JSON written to --output also records
+the interpreter, platform and git revision so runs can be compared over releases.
+"""
+import argparse
+import gc
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+
+import task_9
+
+SPECIFICATIONS = ["2022", "2023", "2024", "16GB/512GB", "8GB/256GB"]
+
+
+def generate_catalog(size, seed=0):
+    """Catalog in the shape produced by process_list_of_products.
+    The timestamp is stored as an ISO string because to_json can not encode datetimes.
+    """
+    rng = random.Random(seed)
+    products = {
+        product_id: {
+            "name": f"Laptop {rng.choice(['Apple', 'Asus', 'Lenovo', 'HP'])} {product_id} \"{rng.randint(13, 17)}\"",
+            "price": {"MDL": float(rng.randint(5000, 120000)), "EUR": round(rng.uniform(250, 6200), 2)},
+            "specifications": rng.choice(SPECIFICATIONS),
+        }
+        for product_id in range(100000, 100000 + size)
+    }
+    return {
+        "products": products,
+        "product_statistics": {
+            "sum": sum(product["price"]["EUR"] for product in products.values()),
+            "currency": "EUR",
+            "timestamp": datetime(2024, 11, 1, tzinfo=timezone.utc).isoformat(),
+        },
+    }
+
+
+FORMATS = {
+    "json": (task_9.to_json, json.loads),
+    # there is no XML reader in task_9, parsing the document back is the closest decode cost
+    "xml": (task_9.to_xml, ET.fromstring),
+    "custom": (task_9.to_custom_serialization, task_9.from_custom_serialization),
+    "binary": (task_9.to_binary_serialization, task_9.from_binary_serialization),
+}
+
+
+def best_time(function, argument, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = function(argument)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def peak_memory(function, argument):
+    """Peak memory allocated while running `function`, measured in a separate traced run"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function(argument)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_case(name, size, data, repeat):
+    encode, decode = FORMATS[name]
+    encode_seconds, encoded = best_time(encode, data, repeat)
+    if name == "xml":
+        # ElementTree refuses str input that carries an encoding declaration
+        encoded = encoded.encode("utf-8")
+    output_size = len(encoded.encode("utf-8")) if isinstance(encoded, str) else len(encoded)
+    decode_seconds, _ = best_time(decode, encoded, repeat)
+    return {
+        "format": name,
+        "products": size,
+        "output_bytes": output_size,
+        "encode_seconds": encode_seconds,
+        "decode_seconds": decode_seconds,
+        "encode_mb_per_second": output_size / encode_seconds / 1e6,
+        "decode_mb_per_second": output_size / decode_seconds / 1e6,
+        "encode_products_per_second": size / encode_seconds,
+        "decode_products_per_second": size / decode_seconds,
+        "encode_peak_bytes": peak_memory(encode, data),
+        "decode_peak_bytes": peak_memory(decode, encoded),
+    }
+
+
+def environment():
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {
+        "python": sys.version,
+        "platform": platform.platform(),
+        "git_revision": revision,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,1000,100000,1000000")
+    parser.add_argument("--formats", default=",".join(FORMATS))
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case, the best one is reported")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = []
+    print(
+        f"{'format':<8}{'products':>10}{'size MB':>10}{'enc s':>9}{'dec s':>9}"
+        f"{'enc MB/s':>10}{'dec MB/s':>10}{'enc peak MB':>13}{'dec peak MB':>13}"
+    )
+    for size in (int(size) for size in args.sizes.split(",")):
+        data = generate_catalog(size, args.seed)
+        for name in args.formats.split(","):
+            result = run_case(name, size, data, args.repeat)
+            results.append(result)
+            print(
+                f"{name:<8}{size:>10}{result['output_bytes'] / 1e6:>10.2f}"
+                f"{result['encode_seconds']:>9.3f}{result['decode_seconds']:>9.3f}"
+                f"{result['encode_mb_per_second']:>10.1f}{result['decode_mb_per_second']:>10.1f}"
+                f"{result['encode_peak_bytes'] / 1e6:>13.1f}{result['decode_peak_bytes'] / 1e6:>13.1f}"
+            )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment(), "seed": args.seed, "repeat": args.repeat, "results": results}, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""Compact binary format for the products / product_statistics data.
+
+Layout (little-endian):
+
+    header        magic "PRB1", version u16, reserved u16, string count u32, string data size u32
+    offsets       (string count + 1) x u32, offsets of every string in the string data
+    string data   all distinct strings, UTF-8 encoded, each stored once
+    value         the root value, a tag byte followed by its payload
+
+Strings (dictionary keys, names, specifications, ...) are referenced by their
+index in the string table. A "products" mapping where every product has the
+scraper shape {name, price: {currency: float}, specifications} is stored as
+columns: int64 ids, u32 name and specification indexes and one float64 array
+per currency, aligned to 8 bytes so they can be read straight out of a
+memoryview or mmap.
+"""
+import mmap
+import struct
+import sys
+from array import array
+from datetime import datetime
+
+MAGIC = b"PRB1"
+VERSION = 1
+HEADER = struct.Struct("<4sHHII")
+
+TAG_NONE = 0
+TAG_FALSE = 1
+TAG_TRUE = 2
+TAG_INT = 3
+TAG_FLOAT = 4
+TAG_STR = 5
+TAG_LIST = 6
+TAG_DICT = 7
+TAG_DATETIME = 8
+TAG_BIGINT = 9
+TAG_PRODUCTS = 10
+
+NO_STRING = 0xFFFFFFFF
+INT64_MIN, INT64_MAX = -(2 ** 63), 2 ** 63 - 1
+
+_TAG = struct.Struct("<B")
+_TAG_U32 = struct.Struct("<BI")
+_TAG_I64 = struct.Struct("<Bq")
+_TAG_F64 = struct.Struct("<Bd")
+_U32 = struct.Struct("<I")
+_I64 = struct.Struct("<q")
+_F64 = struct.Struct("<d")
+_LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+class BinaryFormatError(ValueError):
+    """Raised when a buffer is not a valid binary dump"""
+
+
+def _is_product_mapping(value):
+    """Check whether a products mapping can be stored as columns and still round-trip exactly"""
+    if not value:
+        return False
+    currencies = None
+    for product_id, product in value.items():
+        if type(product_id) is not int or not INT64_MIN <= product_id <= INT64_MAX:
+            return False
+        if type(product) is not dict or list(product) != ["name", "price", "specifications"]:
+            return False
+        if type(product["name"]) is not str or not (product["specifications"] is None or type(product["specifications"]) is str):
+            return False
+        price = product["price"]
+        if type(price) is not dict or not all(type(amount) is float for amount in price.values()):
+            return False
+        if currencies is None:
+            currencies = list(price)
+        elif list(price) != currencies:
+            return False
+    return True
+
+
+class _Encoder:
+    def __init__(self):
+        self.out = bytearray()
+        self.strings = {}
+
+    def string_index(self, value):
+        index = self.strings.get(value)
+        if index is None:
+            index = self.strings[value] = len(self.strings)
+        return index
+
+    def encode(self, value, key=None):
+        out = self.out
+        kind = type(value)
+        if value is None:
+            out += _TAG.pack(TAG_NONE)
+        elif kind is bool:
+            out += _TAG.pack(TAG_TRUE if value else TAG_FALSE)
+        elif kind is int:
+            if INT64_MIN <= value <= INT64_MAX:
+                out += _TAG_I64.pack(TAG_INT, value)
+            else:
+                out += _TAG_U32.pack(TAG_BIGINT, self.string_index(str(value)))
+        elif kind is float:
+            out += _TAG_F64.pack(TAG_FLOAT, value)
+        elif kind is str:
+            out += _TAG_U32.pack(TAG_STR, self.string_index(value))
+        elif kind is datetime:
+            out += _TAG_U32.pack(TAG_DATETIME, self.string_index(value.isoformat()))
+        elif kind is list:
+            out += _TAG_U32.pack(TAG_LIST, len(value))
+            for item in value:
+                self.encode(item)
+        elif kind is dict:
+            if key == "products" and _is_product_mapping(value):
+                self.encode_products(value)
+                return
+            out += _TAG_U32.pack(TAG_DICT, len(value))
+            for item_key, item_value in value.items():
+                self.encode(item_key)
+                self.encode(item_value, item_key)
+        else:
+            raise TypeError(f"Can not serialize {kind.__name__} values")
+
+    def encode_products(self, products):
+        out = self.out
+        currencies = list(next(iter(products.values()))["price"])
+        out += _TAG_U32.pack(TAG_PRODUCTS, len(products))
+        out += _U32.pack(len(currencies))
+        for currency in currencies:
+            out += _U32.pack(self.string_index(currency))
+        # pad so the columns start 8-byte aligned, relative to the start of the value section
+        out += bytes(-len(out) % 8)
+        ids = array("q", products.keys())
+        names = array("I", [self.string_index(product["name"]) for product in products.values()])
+        specifications = array("I", [
+            NO_STRING if product["specifications"] is None else self.string_index(product["specifications"])
+            for product in products.values()
+        ])
+        columns = [ids, names, specifications]
+        columns += [array("d", [product["price"][currency] for product in products.values()]) for currency in currencies]
+        for column in columns:
+            if not _LITTLE_ENDIAN:
+                column.byteswap()
+            out += column.tobytes()
+            out += bytes(-len(out) % 8)
+
+
+def to_binary(data):
+    """Serialize `data` to bytes"""
+    encoder = _Encoder()
+    encoder.encode(data)
+    strings = [string.encode("utf-8") for string in encoder.strings]
+    offsets = array("I", [0])
+    for string in strings:
+        offsets.append(offsets[-1] + len(string))
+    if not _LITTLE_ENDIAN:
+        offsets.byteswap()
+    string_data = b"".join(strings)
+    head = HEADER.pack(MAGIC, VERSION, 0, len(strings), len(string_data)) + offsets.tobytes() + string_data
+    # the value section starts 8-byte aligned so the product columns stay aligned in the file
+    return head + bytes(-len(head) % 8) + encoder.out
+
+
+def write_binary(data, f):
+    f.write(to_binary(data))
+
+
+def _column(view, offset, code, count):
+    """Read a column as a list, through a zero-copy cast of the buffer where the byte order allows it"""
+    size = array(code).itemsize * count
+    end = offset + size
+    if end > len(view):
+        raise BinaryFormatError(f"Truncated binary dump: column at offset {offset} runs past the end")
+    if _LITTLE_ENDIAN:
+        values = view[offset:end].cast(code).tolist()
+    else:
+        values = array(code)
+        values.frombytes(view[offset:end])
+        values.byteswap()
+        values = values.tolist()
+    return values, end + (-end % 8)
+
+
+def from_binary(buffer):
+    """Deserialize a dump from bytes, bytearray, memoryview or mmap without copying the buffer"""
+    view = memoryview(buffer).cast("B")
+    try:
+        return _decode(view)
+    except (IndexError, struct.error, UnicodeDecodeError) as e:
+        # any read past the end, from the string table to the values, means the dump was cut short
+        raise BinaryFormatError(f"Truncated binary dump: {e}")
+    finally:
+        # the decoder closures keep the view alive, release it so an mmap can be closed
+        view.release()
+
+
+def _decode(view):
+    if len(view) < HEADER.size:
+        raise BinaryFormatError("Buffer is too short")
+    magic, version, _, string_count, string_size = HEADER.unpack_from(view, 0)
+    if magic != MAGIC or version != VERSION:
+        raise BinaryFormatError("Not a binary product dump")
+    offsets, _ = _column(view, HEADER.size, "I", string_count + 1)
+    strings_start = HEADER.size + 4 * (string_count + 1)
+    strings = [
+        str(view[strings_start + offsets[idx]:strings_start + offsets[idx + 1]], "utf-8")
+        for idx in range(string_count)
+    ]
+    values_start = strings_start + string_size
+    values_start += -values_start % 8
+
+    unpack_u32 = _U32.unpack_from
+    unpack_i64 = _I64.unpack_from
+    unpack_f64 = _F64.unpack_from
+
+    def decode(offset):
+        tag = view[offset]
+        offset += 1
+        if tag == TAG_STR:
+            return strings[unpack_u32(view, offset)[0]], offset + 4
+        if tag == TAG_INT:
+            return unpack_i64(view, offset)[0], offset + 8
+        if tag == TAG_FLOAT:
+            return unpack_f64(view, offset)[0], offset + 8
+        if tag == TAG_DICT:
+            count = unpack_u32(view, offset)[0]
+            offset += 4
+            result = {}
+            for _ in range(count):
+                key, offset = decode(offset)
+                result[key], offset = decode(offset)
+            return result, offset
+        if tag == TAG_LIST:
+            count = unpack_u32(view, offset)[0]
+            offset += 4
+            result = []
+            for _ in range(count):
+                item, offset = decode(offset)
+                result.append(item)
+            return result, offset
+        if tag == TAG_NONE:
+            return None, offset
+        if tag == TAG_TRUE:
+            return True, offset
+        if tag == TAG_FALSE:
+            return False, offset
+        if tag == TAG_DATETIME:
+            return datetime.fromisoformat(strings[unpack_u32(view, offset)[0]]), offset + 4
+        if tag == TAG_BIGINT:
+            return int(strings[unpack_u32(view, offset)[0]]), offset + 4
+        if tag == TAG_PRODUCTS:
+            return decode_products(offset)
+        raise BinaryFormatError(f"Unknown tag {tag} at offset {offset - 1}")
+
+    def decode_products(offset):
+        count, currency_count = unpack_u32(view, offset)[0], unpack_u32(view, offset + 4)[0]
+        offset += 8
+        currencies = [strings[unpack_u32(view, offset + 4 * idx)[0]] for idx in range(currency_count)]
+        offset += 4 * currency_count
+        # columns are aligned relative to the start of the value section
+        offset += -(offset - values_start) % 8
+        ids, offset = _column(view, offset, "q", count)
+        names, offset = _column(view, offset, "I", count)
+        specifications, offset = _column(view, offset, "I", count)
+        prices = []
+        for _ in currencies:
+            column, offset = _column(view, offset, "d", count)
+            prices.append(column)
+        products = {}
+        for product_id, name, specification, *amounts in zip(ids, names, specifications, *prices):
+            products[product_id] = {
+                "name": strings[name],
+                "price": dict(zip(currencies, amounts)),
+                "specifications": None if specification == NO_STRING else strings[specification],
+            }
+        return products, offset
+
+    return decode(values_start)[0]
+
+
+def load_binary(filename):
+    """Read a dump from a file through mmap, so only the pages that are touched get loaded"""
+    with open(filename, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        return from_binary(mapped)
@@ -0,0 +1,161 @@
+import json
+import logging
+import os
+import threading
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime
+
+from http_client import default_pool
+
+log = logging.getLogger(__name__)
+
+BNM_HOST = "www.bnm.md"
+BNM_RATES_PATH = "/en/official_exchange_rates?get_xml=1&date={date}"
+# MDL per unit, only used when no rate table was ever cached and the first fetch failed
+FALLBACK_RATES = {"MDL": 1.0, "EUR": 19.24}
+# seconds before a failed refresh is tried again, doubled after every further failure up to REFRESH_MAX_BACKOFF
+REFRESH_BACKOFF = 60
+REFRESH_MAX_BACKOFF = 3600
+
+
+def parse_bnm_rates(xml_content):
+    """Parse the BNM official rates XML into {currency: MDL per one unit of currency}"""
+    rates = {"MDL": 1.0}
+    for valute in ET.fromstring(xml_content).iter("Valute"):
+        code = valute.findtext("CharCode")
+        nominal = valute.findtext("Nominal")
+        value = valute.findtext("Value")
+        if not code or not value:
+            continue
+        rates[code.strip()] = float(value.replace(",", ".")) / float(nominal or 1)
+    return rates
+
+
+def fetch_bnm_rates():
+    """Download today's official rate table from the National Bank of Moldova"""
+    path = BNM_RATES_PATH.format(date=datetime.now().strftime("%d.%m.%Y"))
+    response = default_pool.request("GET", BNM_HOST, path)
+    if response.status != 200:
+        raise RuntimeError(f"BNM rates request failed with status {response.status}")
+    return parse_bnm_rates(response.body)
+
+
+class ExchangeRateProvider:
+    """Serves conversions from an in-memory rate table that is cached on disk and refreshed after `ttl` seconds.
+
+    Only the first lookup without any cached table waits for the network, once. After that a
+    stale table keeps being served while a background thread refreshes it. FALLBACK_RATES are
+    used only when that first fetch failed. After a failed refresh the next one waits for a backoff.
+    """
+
+    def __init__(self, cache_file=".exchange_rates.json", ttl=6 * 3600, fetch=fetch_bnm_rates):
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.fetch = fetch
+        self.rates = dict(FALLBACK_RATES)
+        self.fetched_at = 0.0
+        self.lock = threading.Lock()
+        self.refreshing = False
+        self.initial_lock = threading.Lock()
+        self.initial_fetch_done = False
+        self.failures = 0
+        self.retry_at = 0.0
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.cache_file, encoding="utf-8") as f:
+                cached = json.load(f)
+            self.rates = cached["rates"]
+            self.fetched_at = cached["fetched_at"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def _save(self):
+        tmp_file = f"{self.cache_file}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({"rates": self.rates, "fetched_at": self.fetched_at}, f)
+        os.replace(tmp_file, self.cache_file)
+
+    @property
+    def is_stale(self):
+        return time.time() - self.fetched_at > self.ttl
+
+    def refresh(self):
+        """Fetch the rate table now, keeping the current one if the fetch fails"""
+        try:
+            rates = self.fetch()
+        except Exception as e:
+            self.failures += 1
+            backoff = min(min(self.ttl, REFRESH_BACKOFF) * 2 ** min(self.failures - 1, 16), REFRESH_MAX_BACKOFF)
+            self.retry_at = time.time() + backoff
+            log.warning(f"Could not refresh exchange rates: {e}, next attempt in {backoff:.0f}s")
+            return False
+        # replace the whole table at once so readers never see a half updated one
+        self.rates = rates
+        self.fetched_at = time.time()
+        self.failures = 0
+        self.retry_at = 0.0
+        try:
+            self._save()
+        except OSError as e:
+            log.warning(f"Could not cache exchange rates: {e}")
+        return True
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh()
+        finally:
+            with self.lock:
+                self.refreshing = False
+
+    def _ensure_fresh(self):
+        if not self.fetched_at and not self.initial_fetch_done:
+            # there is no table to serve while refreshing, concurrent lookups wait for the same fetch
+            with self.initial_lock:
+                if not self.fetched_at and not self.initial_fetch_done:
+                    self.refresh()
+                    self.initial_fetch_done = True
+            return
+        if not self.is_stale or time.time() < self.retry_at:
+            return
+        with self.lock:
+            if self.refreshing:
+                return
+            self.refreshing = True
+        threading.Thread(target=self._refresh_in_background, daemon=True).start()
+
+    def currencies(self):
+        self._ensure_fresh()
+        return self.rates.keys()
+
+    def mdl_per_unit(self, currency):
+        """MDL paid for one unit of `currency`, e.g. mdl_per_unit("EUR") is the MDL to EUR rate"""
+        self._ensure_fresh()
+        try:
+            return self.rates[currency]
+        except KeyError:
+            raise ValueError(f"Currency {currency} is not available")
+
+    def rate(self, from_currency, to_currency):
+        """Units of `to_currency` for one unit of `from_currency`"""
+        return self.mdl_per_unit(from_currency) / self.mdl_per_unit(to_currency)
+
+    def convert(self, amount, from_currency, to_currency):
+        return amount * self.rate(from_currency, to_currency)
+
+
+_default_provider = None
+_default_provider_lock = threading.Lock()
+
+
+def get_default_provider():
+    global _default_provider
+    with _default_provider_lock:
+        if _default_provider is None:
+            _default_provider = ExchangeRateProvider(
+                cache_file=os.getenv("EXCHANGE_RATES_CACHE", ".exchange_rates.json"),
+                ttl=int(os.getenv("EXCHANGE_RATES_TTL", 6 * 3600)),
+            )
+        return _default_provider
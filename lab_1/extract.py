@@ -0,0 +1,199 @@
+import codecs
+from html.parser import HTMLParser
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+BACKENDS = ("html.parser", "lxml")
+
+
+def _has_class(attrs, class_name):
+    return class_name in (attrs.get("class") or "").split()
+
+
+class ListingHandler:
+    """Collects the title, price and detail link of every div.catalog__pill, ignoring the rest of the page"""
+
+    def __init__(self):
+        self.pills = []
+        self.done = False
+        self.pill = None
+        self.pill_depth = 0
+        self.capture = None
+        self.capture_tag = None
+        self.capture_depth = 0
+
+    def start(self, tag, attrs):
+        if self.pill is None:
+            if tag == "div" and _has_class(attrs, "catalog__pill"):
+                self.pill = {"title": None, "price": None, "link": None}
+                self.pill_depth = 1
+            return
+        if tag == "div":
+            self.pill_depth += 1
+        if self.capture is not None:
+            if tag == self.capture_tag:
+                self.capture_depth += 1
+            return
+        if tag == "a" and self.pill["link"] is None:
+            self.pill["link"] = attrs.get("href")
+        elif tag == "span" and self.pill["title"] is None and _has_class(attrs, "catalog__pill__text__title"):
+            self._start_capture("title", tag)
+        elif tag == "div" and self.pill["price"] is None and _has_class(attrs, "catalog__pill__controls__price"):
+            self._start_capture("price", tag)
+
+    def _start_capture(self, field, tag):
+        self.capture = field
+        self.capture_tag = tag
+        self.capture_depth = 1
+        self.pill[field] = ""
+
+    def end(self, tag):
+        if self.pill is None:
+            return
+        if self.capture is not None and tag == self.capture_tag:
+            self.capture_depth -= 1
+            if self.capture_depth == 0:
+                self.capture = None
+        if tag == "div":
+            self.pill_depth -= 1
+            if self.pill_depth == 0:
+                self.pills.append(self.pill)
+                self.pill = None
+                self.capture = None
+
+    def data(self, text):
+        if self.capture is not None:
+            self.pill[self.capture] += text
+
+    def close(self):
+        return self.pills
+
+
+class ProductIdHandler:
+    """Captures the text of the first div.catalog__item__id and reports when it is complete"""
+
+    def __init__(self):
+        self.product_id = None
+        self.done = False
+        self.depth = 0
+
+    def start(self, tag, attrs):
+        if self.done or tag != "div":
+            return
+        if self.depth:
+            self.depth += 1
+        elif _has_class(attrs, "catalog__item__id"):
+            self.product_id = ""
+            self.depth = 1
+
+    def end(self, tag):
+        if self.depth and tag == "div":
+            self.depth -= 1
+            if self.depth == 0:
+                self.done = True
+
+    def data(self, text):
+        if self.depth and not self.done:
+            self.product_id += text
+
+    def close(self):
+        return self.product_id
+
+
+class _HTMLParserBackend(HTMLParser):
+    def __init__(self, handler):
+        super().__init__(convert_charrefs=True)
+        self.handler = handler
+
+    def handle_starttag(self, tag, attrs):
+        self.handler.start(tag, dict(attrs))
+
+    def handle_endtag(self, tag):
+        self.handler.end(tag)
+
+    def handle_data(self, data):
+        self.handler.data(data)
+
+
+class _LxmlTarget:
+    """Adapts a handler to the lxml parser target interface"""
+
+    def __init__(self, handler):
+        self.handler = handler
+
+    def start(self, tag, attrib):
+        self.handler.start(tag, attrib)
+
+    def end(self, tag):
+        self.handler.end(tag)
+
+    def data(self, text):
+        self.handler.data(text)
+
+    def close(self):
+        return None
+
+
+class StreamingExtractor:
+    """Feeds HTML to a handler chunk by chunk, so parsing can start before the page is fully received.
+
+    `backend` is either "html.parser" (standard library) or "lxml" (needs lxml installed).
+    """
+
+    def __init__(self, handler, backend="html.parser"):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown parser backend {backend}, expected one of {BACKENDS}")
+        self.handler = handler
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        if backend == "lxml":
+            if etree is None:
+                raise ImportError("The lxml backend requires the lxml package")
+            self.parser = etree.HTMLParser(target=_LxmlTarget(handler))
+        else:
+            self.parser = _HTMLParserBackend(handler)
+
+    @property
+    def done(self):
+        return self.handler.done
+
+    def feed(self, chunk):
+        if isinstance(chunk, (bytes, bytearray, memoryview)):
+            chunk = self.decoder.decode(chunk)
+        if chunk:
+            self.parser.feed(chunk)
+        return self.handler.done
+
+    def close(self):
+        tail = self.decoder.decode(b"", final=True)
+        if tail:
+            self.parser.feed(tail)
+        try:
+            self.parser.close()
+        except Exception:
+            # lxml complains about documents we stopped feeding halfway, the handler has what we need
+            pass
+        return self.handler.close()
+
+
+def _extract(handler, content, backend):
+    extractor = StreamingExtractor(handler, backend)
+    chunks = [content] if isinstance(content, (str, bytes, bytearray)) else content
+    for chunk in chunks:
+        if extractor.feed(chunk):
+            break
+    return extractor.close()
+
+
+def extract_listing(content, backend="html.parser"):
+    """Extract the raw title, price and link of every catalog pill.
+    `content` is the page as str/bytes or an iterable of chunks.
+    """
+    return _extract(ListingHandler(), content, backend)
+
+
+def extract_product_id(content, backend="html.parser"):
+    """Extract the raw catalog item id text, stops consuming `content` as soon as it is found"""
+    return _extract(ProductIdHandler(), content, backend)
@@ -0,0 +1,266 @@
+"""Local stand-in for cactus.md that replays recorded pages.
+
+Fixtures live in a directory with a manifest.json mapping request paths to files:
+
+    python fixture_server.py record fixtures --max-pages 3     # needs the live site once
+    python fixture_server.py generate fixtures --pages 20      # synthetic pages, no network at all
+    python fixture_server.py serve fixtures --port 8443 --latency 0.05 --bandwidth 1000000 --error-rate 0.01
+
+Unknown paths get a 404 with an empty body, so a crawl stops after the last listing
+page. Point the scraper at a running server with
+`default_pool.route(task_9.host, "127.0.0.1", server.port, server.client_ssl_context())`.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import random
+import ssl
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+log = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+
+
+def load_fixtures(directory):
+    """Read the {path: body bytes} mapping of a fixture directory"""
+    with open(os.path.join(directory, MANIFEST), encoding="utf-8") as f:
+        manifest = json.load(f)
+    fixtures = {}
+    for path, filename in manifest.items():
+        with open(os.path.join(directory, filename), "rb") as f:
+            fixtures[path] = f.read()
+    return fixtures
+
+
+def save_fixtures(directory, fixtures):
+    """Write a {path: body bytes} mapping as a fixture directory"""
+    os.makedirs(directory, exist_ok=True)
+    manifest = {}
+    for path, body in fixtures.items():
+        filename = hashlib.sha1(path.encode("utf-8")).hexdigest() + ".html"
+        with open(os.path.join(directory, filename), "wb") as f:
+            f.write(body)
+        manifest[path] = filename
+    with open(os.path.join(directory, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=4)
+
+
+def record_fixtures(directory, max_pages=3):
+    """Crawl the live listing pages and their detail pages once and save them as fixtures"""
+    from extract import extract_listing
+    from http_client import default_pool
+    from task_9 import host, listing_path_template
+
+    fixtures = {}
+    seen_links = set()
+    for page in range(1, max_pages + 1):
+        path = listing_path_template.format(page=page)
+        body = bytes(default_pool.request("GET", host, path).body)
+        links = [pill["link"] for pill in extract_listing(body) if pill["link"] not in seen_links]
+        if not links:
+            break
+        fixtures[path] = body
+        for link in links:
+            seen_links.add(link)
+            fixtures[link] = bytes(default_pool.request("GET", host, link).body)
+        log.info(f"Recorded listing page {page} with {len(links)} products")
+    save_fixtures(directory, fixtures)
+    return fixtures
+
+
+def generate_fixtures(pages=10, products_per_page=24, seed=0):
+    """Synthetic listing and detail pages with the cactus.md markup the extractors look for"""
+    from task_9 import listing_path_template
+
+    rng = random.Random(seed)
+    filler = "<div class='banner'><p>" + "lorem ipsum " * 200 + "</p></div>"
+    fixtures = {}
+    product_id = 100000
+    for page in range(1, pages + 1):
+        pills = []
+        for _ in range(products_per_page):
+            product_id += 1
+            link = f"/ro/catalogue/electronice/kompyuternaya-tehnika/noutbuki/laptop-{product_id}/"
+            price = f"{rng.randint(5, 120)} {rng.randint(0, 999):03d} lei"
+            pills.append(
+                "<div class='catalog__pill'>"
+                f"<a href='{link}'><img src='/img/{product_id}.jpg'></a>"
+                f"<span class='catalog__pill__text__title'>Laptop {product_id} (16GB/512GB)</span>"
+                f"<div class='catalog__pill__controls'><div class='catalog__pill__controls__price'>{price}</div></div>"
+                "</div>"
+            )
+            fixtures[link] = (
+                f"<html><body>{filler}<div class='catalog__item'>"
+                f"<div class='catalog__item__id'>Cod:\xa0{product_id}</div></div>{filler}</body></html>"
+            ).encode("utf-8")
+        fixtures[listing_path_template.format(page=page)] = (
+            f"<html><body>{filler}<div class='catalog'>{''.join(pills)}</div>{filler}</body></html>"
+        ).encode("utf-8")
+    return fixtures
+
+
+class FixtureServer:
+    """Threaded HTTP/1.1 keep-alive server replaying `fixtures`, over TLS when a certificate is given.
+
+    Every response waits `latency` seconds (plus up to `jitter`), bodies are sent at most
+    `bandwidth` bytes per second per connection (0 is unlimited) and a fraction `error_rate`
+    of the requests get a 503. The random choices come from `seed`, so runs are repeatable.
+    """
+
+    def __init__(self, fixtures, latency=0.0, jitter=0.0, bandwidth=0, error_rate=0.0, seed=0,
+                 certfile=None, keyfile=None, address="127.0.0.1", port=0):
+        self.fixtures = fixtures
+        self.latency = latency
+        self.jitter = jitter
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+        self.certfile = certfile
+        self.requests = 0
+        self.errors = 0
+        self.server = ThreadingHTTPServer((address, port), _handler(self))
+        self.server.daemon_threads = True
+        if certfile is not None:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile, keyfile)
+            self.server.socket = context.wrap_socket(self.server.socket, server_side=True)
+        self.thread = None
+
+    @property
+    def address(self):
+        return self.server.server_address[0]
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    @property
+    def tls(self):
+        return self.certfile is not None
+
+    def client_ssl_context(self):
+        """Context trusting the server certificate whatever host name the client asks for, None over plain HTTP"""
+        if not self.tls:
+            return None
+        context = ssl.create_default_context(cafile=self.certfile)
+        context.check_hostname = False
+        return context
+
+    def _draw(self):
+        """Decide the delay and failure of one response"""
+        with self.random_lock:
+            self.requests += 1
+            delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+            failed = self.error_rate and self.random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        return delay, failed
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def _handler(fixture_server):
+    class FixtureRequestHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # headers and body go out in separate writes, without this the client's delayed ACK adds ~40ms per response
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            delay, failed = fixture_server._draw()
+            if delay:
+                time.sleep(delay)
+            body = fixture_server.fixtures.get(self.path)
+            if failed:
+                self._respond(503, b"")
+            elif body is None:
+                self._respond(404, b"")
+            else:
+                self._respond(200, body)
+
+        def _respond(self, status, body):
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            bandwidth = fixture_server.bandwidth
+            if not bandwidth:
+                self.wfile.write(body)
+                return
+            # send in slices of ~10ms worth of data to approximate the bandwidth limit
+            chunk_size = max(1, bandwidth // 100)
+            started = time.perf_counter()
+            for offset in range(0, len(body), chunk_size):
+                self.wfile.write(body[offset:offset + chunk_size])
+                ahead = (offset + chunk_size) / bandwidth - (time.perf_counter() - started)
+                if ahead > 0:
+                    time.sleep(ahead)
+
+        def log_message(self, format, *args):
+            log.debug(format % args)
+
+    return FixtureRequestHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    record = commands.add_parser("record", help="save live pages as fixtures")
+    record.add_argument("directory")
+    record.add_argument("--max-pages", type=int, default=3)
+    generate = commands.add_parser("generate", help="write synthetic fixtures")
+    generate.add_argument("directory")
+    generate.add_argument("--pages", type=int, default=10)
+    generate.add_argument("--products-per-page", type=int, default=24)
+    generate.add_argument("--seed", type=int, default=0)
+    serve = commands.add_parser("serve", help="replay fixtures until interrupted")
+    serve.add_argument("directory")
+    serve.add_argument("--port", type=int, default=8080)
+    serve.add_argument("--latency", type=float, default=0.0, help="seconds before every response")
+    serve.add_argument("--jitter", type=float, default=0.0, help="extra random latency, up to this many seconds")
+    serve.add_argument("--bandwidth", type=int, default=0, help="bytes per second per connection, 0 is unlimited")
+    serve.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    serve.add_argument("--seed", type=int, default=0)
+    serve.add_argument("--certfile", help="serve HTTPS with this certificate")
+    serve.add_argument("--keyfile")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "record":
+        record_fixtures(args.directory, args.max_pages)
+    elif args.command == "generate":
+        save_fixtures(args.directory, generate_fixtures(args.pages, args.products_per_page, args.seed))
+    else:
+        server = FixtureServer(
+            load_fixtures(args.directory), latency=args.latency, jitter=args.jitter, bandwidth=args.bandwidth,
+            error_rate=args.error_rate, seed=args.seed, certfile=args.certfile, keyfile=args.keyfile, port=args.port,
+        )
+        log.info(f"Serving {len(server.fixtures)} fixtures on {'https' if server.tls else 'http'}://{server.address}:{server.port}")
+        try:
+            server.server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,404 @@
+import socket
+import ssl
+import threading
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/129.0.0.0 Safari/537.36"
+
+
+class HTTPError(Exception):
+    """Raised when the server sends a response that can not be parsed"""
+
+
+class HTTPStatusError(Exception):
+    """Raised by raise_for_status() for a 4xx or 5xx response"""
+
+    def __init__(self, status, reason):
+        super().__init__(f"HTTP {status} {reason}".rstrip())
+        self.status = status
+        self.reason = reason
+
+    @property
+    def transient(self):
+        """True for statuses that may go away when the request is repeated later"""
+        return self.status == 429 or self.status >= 500
+
+
+def _raise_for_status(status, reason):
+    if status >= 400:
+        raise HTTPStatusError(status, reason)
+
+
+class HTTPResponse:
+    def __init__(self, status, reason, headers, body):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+
+    @property
+    def text(self):
+        return self.body.decode("utf-8", errors="ignore")
+
+    def raise_for_status(self):
+        _raise_for_status(self.status, self.reason)
+
+
+class StreamingResponse:
+    """Response whose body is read lazily with iter_chunks()"""
+
+    def __init__(self, connection, status, reason, headers, body_kind):
+        self.connection = connection
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body_kind = body_kind
+        self.consumed = body_kind == "empty"
+        self.received = 0
+        self.pieces = None
+
+    def raise_for_status(self):
+        _raise_for_status(self.status, self.reason)
+
+    def iter_chunks(self, chunk_size=16384):
+        if self.pieces is None:
+            self.pieces = self.connection.iter_body(self.headers, self.body_kind, chunk_size)
+        for piece in self.pieces:
+            self.received += len(piece)
+            yield piece
+        self.consumed = True
+
+    def drain(self, limit):
+        """Read and drop the rest of the body if at most `limit` bytes are left, returns True on success"""
+        if self.consumed:
+            return True
+        if self.body_kind != "length":
+            return False
+        if int(self.headers["content-length"]) - self.received > limit:
+            return False
+        for _ in self.iter_chunks():
+            pass
+        return True
+
+
+class HTTPConnection:
+    """Single HTTP/1.1 connection reading the socket through one preallocated buffer"""
+
+    def __init__(self, host, port, ssl_context=None, timeout=30, buffer_size=65536, server_hostname=None):
+        self.host = host
+        self.port = port
+        sock = socket.create_connection((host, port), timeout=timeout)
+        if ssl_context is not None:
+            sock = ssl_context.wrap_socket(sock, server_hostname=server_hostname or host)
+        self.sock = sock
+        self.buffer = bytearray(buffer_size)
+        self.view = memoryview(self.buffer)
+        self.start = 0
+        self.end = 0
+        self.closed = False
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.view.release()
+            self.sock.close()
+
+    def _fill(self):
+        """Read more bytes from the socket into the free tail of the buffer"""
+        if self.start == self.end:
+            self.start = self.end = 0
+        elif self.end == len(self.buffer):
+            if self.start == 0:
+                # a single header line does not fit into the buffer, grow it
+                self.view.release()
+                self.buffer.extend(bytes(len(self.buffer)))
+                self.view = memoryview(self.buffer)
+            else:
+                pending = self.end - self.start
+                self.buffer[:pending] = self.buffer[self.start:self.end]
+                self.start, self.end = 0, pending
+        received = self.sock.recv_into(self.view[self.end:])
+        self.end += received
+        return received
+
+    def readline(self):
+        """Read a single CRLF terminated line, without the line ending"""
+        scanned = 0
+        while True:
+            idx = self.buffer.find(b"\r\n", self.start + scanned, self.end)
+            if idx != -1:
+                line = bytes(self.view[self.start:idx])
+                self.start = idx + 2
+                return line
+            # keep the last byte in the window in case the CRLF is split between reads
+            scanned = max(0, self.end - self.start - 1)
+            if not self._fill():
+                raise ConnectionError("Connection closed while reading a line")
+
+    def readinto(self, out_view):
+        """Fill `out_view` completely, first from the buffer and then straight from the socket"""
+        filled = min(len(out_view), self.end - self.start)
+        out_view[:filled] = self.view[self.start:self.start + filled]
+        self.start += filled
+        while filled < len(out_view):
+            received = self.sock.recv_into(out_view[filled:])
+            if not received:
+                raise ConnectionError("Connection closed before the body was complete")
+            filled += received
+        return filled
+
+    def read(self, size):
+        body = bytearray(size)
+        with memoryview(body) as body_view:
+            self.readinto(body_view)
+        return body
+
+    def read_until_close(self):
+        body = bytearray(self.view[self.start:self.end])
+        self.start = self.end = 0
+        while True:
+            received = self._fill()
+            if not received:
+                return body
+            body += self.view[self.start:self.end]
+            self.start = self.end = 0
+
+    def send_request(self, method, path, headers):
+        lines = [f"{method} {path} HTTP/1.1"]
+        lines.extend(f"{key}: {value}" for key, value in headers.items())
+        self.sock.sendall(("\r\n".join(lines) + "\r\n\r\n").encode())
+
+    def read_response_head(self, method):
+        """Read the status line and headers, returns (status, reason, headers, body_kind, keep_alive)"""
+        status_line = self.readline().decode("iso-8859-1")
+        try:
+            version, status, *reason = status_line.split(" ", 2)
+            status = int(status)
+        except ValueError:
+            raise HTTPError(f"Malformed status line: {status_line!r}")
+        headers = {}
+        while True:
+            line = self.readline()
+            if not line:
+                break
+            key, _, value = line.decode("iso-8859-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+
+        keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+        if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+            body_kind = "empty"
+        elif "chunked" in headers.get("transfer-encoding", "").lower():
+            body_kind = "chunked"
+        elif "content-length" in headers:
+            body_kind = "length"
+        else:
+            body_kind = "close"
+            keep_alive = False
+        return status, reason[0] if reason else "", headers, body_kind, keep_alive
+
+    def read_response(self, method):
+        status, reason, headers, body_kind, keep_alive = self.read_response_head(method)
+        if body_kind == "chunked":
+            body = self.read_chunked()
+        elif body_kind == "length":
+            body = self.read(int(headers["content-length"]))
+        elif body_kind == "close":
+            body = self.read_until_close()
+        else:
+            body = bytearray()
+        return HTTPResponse(status, reason, headers, body), keep_alive
+
+    def iter_body(self, headers, body_kind, chunk_size=16384):
+        """Yield the body piece by piece as it arrives instead of buffering all of it"""
+        if body_kind == "chunked":
+            while True:
+                size = int(self.readline().split(b";", 1)[0], 16)
+                if size == 0:
+                    while self.readline():
+                        pass
+                    return
+                while size:
+                    piece = self.read(min(size, chunk_size))
+                    size -= len(piece)
+                    yield piece
+                self.readline()
+        elif body_kind == "length":
+            remaining = int(headers["content-length"])
+            while remaining:
+                piece = self.read(min(remaining, chunk_size))
+                remaining -= len(piece)
+                yield piece
+        elif body_kind == "close":
+            if self.end > self.start:
+                yield bytes(self.view[self.start:self.end])
+                self.start = self.end = 0
+            while self._fill():
+                yield bytes(self.view[self.start:self.end])
+                self.start = self.end = 0
+
+    def read_chunked(self):
+        body = bytearray()
+        while True:
+            size_line = self.readline()
+            size = int(size_line.split(b";", 1)[0], 16)
+            if size == 0:
+                # skip the trailer section
+                while self.readline():
+                    pass
+                return body
+            offset = len(body)
+            body.extend(bytes(size))
+            with memoryview(body) as body_view:
+                self.readinto(body_view[offset:offset + size])
+            self.readline()
+
+
+class ConnectionPool:
+    """Pool of keep-alive connections, shared between threads and keyed by (host, port, tls)"""
+
+    def __init__(self, max_idle_per_host=10, timeout=30, controller=None):
+        self.max_idle_per_host = max_idle_per_host
+        self.timeout = timeout
+        # optional rate_control.AIMDController every request has to get a slot from
+        self.controller = controller
+        self._ssl_context = None
+        self.idle = {}
+        self.routes = {}
+        self.lock = threading.Lock()
+
+    @property
+    def ssl_context(self):
+        """Default TLS context, created on first use because loading the CA certificates is slow"""
+        if self._ssl_context is None:
+            self._ssl_context = ssl.create_default_context()
+        return self._ssl_context
+
+    def route(self, host, address, port, ssl_context=None):
+        """Send every request for `host` to `address`:`port` instead, like curl --resolve.
+        The Host header is kept, plain HTTP is used unless an `ssl_context` is given.
+        Used to point the scraper at a local stand-in such as fixture_server.FixtureServer.
+        """
+        with self.lock:
+            self.routes[host] = (address, port, ssl_context)
+        self._close_idle(host)
+
+    def unroute(self, host):
+        with self.lock:
+            self.routes.pop(host, None)
+        self._close_idle(host)
+
+    def _close_idle(self, host):
+        """Close the idle connections to `host` so the next request follows the current route"""
+        with self.lock:
+            keys = [key for key in self.idle if key[0] == host]
+            connections = [connection for key in keys for connection in self.idle.pop(key)]
+        for connection in connections:
+            connection.close()
+
+    def _acquire(self, key):
+        with self.lock:
+            connections = self.idle.get(key)
+            if connections:
+                return connections.pop(), True
+            route = self.routes.get(key[0])
+        host, port, tls = key
+        if route is not None:
+            address, port, ssl_context = route
+            return HTTPConnection(address, port, ssl_context, timeout=self.timeout, server_hostname=host), False
+        ssl_context = self.ssl_context if tls else None
+        return HTTPConnection(host, port, ssl_context, timeout=self.timeout), False
+
+    def _release(self, key, connection):
+        with self.lock:
+            connections = self.idle.setdefault(key, deque())
+            if len(connections) < self.max_idle_per_host:
+                connections.append(connection)
+                return
+        connection.close()
+
+    def _request_headers(self, host, port, headers):
+        request_headers = {
+            "Host": host if port in (80, 443) else f"{host}:{port}",
+            "User-Agent": USER_AGENT,
+            "Accept-Encoding": "identity",
+            "Connection": "keep-alive",
+        }
+        request_headers.update(headers or {})
+        return request_headers
+
+    def _send(self, key, method, path, request_headers, read):
+        """Send the request and run `read` on the connection, retrying once on a stale pooled connection"""
+        while True:
+            connection, reused = self._acquire(key)
+            try:
+                connection.send_request(method, path, request_headers)
+                return connection, read(connection)
+            except OSError:
+                connection.close()
+                if reused:
+                    # the server dropped an idle connection, retry on a fresh one
+                    continue
+                raise
+            except Exception:
+                connection.close()
+                raise
+
+    def request(self, method, host, path, headers=None, port=None, tls=True):
+        """Send a request over a pooled connection and return the HTTPResponse"""
+        port = port or (443 if tls else 80)
+        key = (host, port, tls)
+        request_headers = self._request_headers(host, port, headers)
+        with self._track() as observation:
+            connection, (response, keep_alive) = self._send(
+                key, method, path, request_headers, lambda connection: connection.read_response(method)
+            )
+            if observation is not None:
+                observation.response(response.status)
+        if keep_alive:
+            self._release(key, connection)
+        else:
+            connection.close()
+        return response
+
+    @contextmanager
+    def stream(self, method, host, path, headers=None, port=None, tls=True, drain_limit=65536):
+        """Send a request and yield a StreamingResponse, the body is read only as far as the caller iterates.
+
+        A body left unread is drained when at most `drain_limit` bytes remain so the connection can be reused,
+        otherwise the connection is closed.
+        """
+        port = port or (443 if tls else 80)
+        key = (host, port, tls)
+        request_headers = self._request_headers(host, port, headers)
+        # the slot is held until the body is done with, the latency is measured up to the response head
+        with self._track() as observation:
+            connection, head = self._send(
+                key, method, path, request_headers, lambda connection: connection.read_response_head(method)
+            )
+            status, reason, response_headers, body_kind, keep_alive = head
+            if observation is not None:
+                observation.response(status)
+            response = StreamingResponse(connection, status, reason, response_headers, body_kind)
+            reusable = False
+            try:
+                yield response
+                reusable = keep_alive and response.drain(drain_limit)
+            finally:
+                if reusable:
+                    self._release(key, connection)
+                else:
+                    connection.close()
+
+    def _track(self):
+        return self.controller.track() if self.controller is not None else nullcontext()
+
+    def close(self):
+        with self.lock:
+            for connections in self.idle.values():
+                for connection in connections:
+                    connection.close()
+            self.idle.clear()
+
+
+default_pool = ConnectionPool()
@@ -0,0 +1,155 @@
+"""Append-only NDJSON results: one product per line, written as it is scraped.
+
+    with NDJSONWriter("results.ndjson") as writer:
+        for product in pipeline.scrape():
+            writer.write(product)
+    compact("results.ndjson", "results.json")
+
+Lines are the products of the pipeline, {"id", "name", "price", "specifications"} and "error" when the id could not be fetched.
+Every line goes out in a single write and is flushed at once, fsync runs once per
+batch, so a crash loses at most the last unsynced batch and a torn last line,
+which readers skip and the next writer cuts off.
+"""
+import json
+import os
+import time
+from datetime import datetime
+
+from task_9 import save_to_json
+
+
+def _default(obj):
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _truncate_torn_line(filename, block_size=65536):
+    """Cut a last line left unfinished by a crash, so appending does not glue a product onto it"""
+    try:
+        f = open(filename, "r+b")
+    except FileNotFoundError:
+        return
+    with f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            start = max(0, position - block_size)
+            f.seek(start)
+            block = f.read(position - start)
+            newline = block.rfind(b"\n")
+            if newline != -1:
+                position = start + newline + 1
+                break
+            position = start
+        if position != end:
+            f.truncate(position)
+
+
+class NDJSONWriter:
+    """Appends products to `filename`, fsyncing every `fsync_every` lines or `fsync_interval` seconds"""
+
+    def __init__(self, filename="results.ndjson", fsync_every=100, fsync_interval=1.0):
+        _truncate_torn_line(filename)
+        self.filename = filename
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.f = open(filename, "ab")
+        self.unsynced = 0
+        self.synced_at = time.monotonic()
+        self.written = 0
+
+    def write(self, product):
+        line = json.dumps(product, default=_default, ensure_ascii=False) + "\n"
+        self.f.write(line.encode("utf-8"))
+        # flush every line so tailing readers see it right away, only the fsync is batched
+        self.f.flush()
+        self.written += 1
+        self.unsynced += 1
+        if self.unsynced >= self.fsync_every or time.monotonic() - self.synced_at >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        if self.unsynced:
+            os.fsync(self.f.fileno())
+            self.unsynced = 0
+        self.synced_at = time.monotonic()
+
+    def close(self):
+        if not self.f.closed:
+            self.f.flush()
+            self.sync()
+            self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def write_ndjson(products, filename="results.ndjson", fsync_every=100, fsync_interval=1.0):
+    """Sink that appends every product of the stream to `filename`, returns the count"""
+    with NDJSONWriter(filename, fsync_every, fsync_interval) as writer:
+        for product in products:
+            writer.write(product)
+        return writer.written
+
+
+def _parse_lines(f):
+    """Yield the products of the complete lines from the current position.
+    An unfinished last line is left unread, the file is positioned at its start.
+    """
+    while True:
+        start = f.tell()
+        line = f.readline()
+        if not line:
+            return
+        if not line.endswith(b"\n"):
+            # re-read it next time, a restarted writer may also have truncated it in the meantime
+            f.seek(start)
+            return
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_ndjson(filename="results.ndjson"):
+    """Yield the stored products, ignoring a last line cut short by a crash"""
+    with open(filename, "rb") as f:
+        yield from _parse_lines(f)
+
+
+def tail_ndjson(filename="results.ndjson", poll_interval=0.5, stop=None):
+    """Yield the stored products and then the new ones as they are appended, like tail -f.
+    Runs until `stop` (a threading.Event) is set, lines written before that are still yielded.
+    """
+    while not os.path.exists(filename):
+        if stop is not None and stop.is_set():
+            return
+        time.sleep(poll_interval)
+    with open(filename, "rb") as f:
+        while True:
+            stopping = stop is not None and stop.is_set()
+            yield from _parse_lines(f)
+            if stopping:
+                return
+            time.sleep(poll_interval)
+
+
+def compact(filename="results.ndjson", output="results.json", fetch_errors=None):
+    """Rewrite the NDJSON results in the results.json layout of save_to_json, a later line for an id wins.
+    The "error" of failed products stays in the NDJSON file, it goes to `fetch_errors` when a dict is given.
+    """
+    data = {"products": {}}
+    for product in read_ndjson(filename):
+        if "error" in product and fetch_errors is not None:
+            fetch_errors[product["id"]] = product["error"]
+        data["products"][product["id"]] = {
+            "name": product["name"],
+            "price": product["price"],
+            "specifications": product["specifications"],
+        }
+    tmp_file = f"{output}.tmp"
+    save_to_json(data, tmp_file)
+    os.replace(tmp_file, output)
+    return data
@@ -0,0 +1,211 @@
+"""Lazy scrape pipeline: every stage is a generator that takes the previous stage as input.
+
+    pages = fetch_pages(listing_paths(), host)
+    products = validate(fetch_details(extract_pills(pages), host))
+    with open("results.json", "w", encoding="utf-8") as f:
+        write_json(products, f)
+
+Nothing is fetched until a sink starts pulling, and products flow through one at
+a time: only the current listing page and the detail pages in flight are held in
+memory, so sinks can store or forward products while the crawl is still running.
+"""
+import json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+import logging
+
+from extract import extract_listing
+from http_client import HTTPError, HTTPStatusError
+from task_9 import (
+    detail_fetch_concurrency,
+    extract_product_from_pill,
+    failed_product_key,
+    fetch_listing_page,
+    fetch_raw_product_id,
+    host as default_host,
+    html_parser_backend,
+    listing_path_template,
+    validate_id,
+)
+
+log = logging.getLogger(__name__)
+
+
+def listing_paths(template=listing_path_template, max_pages=0):
+    """Yield the listing page paths, without end when `max_pages` is 0"""
+    pages = count(1) if not max_pages else range(1, max_pages + 1)
+    for page in pages:
+        yield template.format(page=page)
+
+
+def fetch_pages(paths, host=default_host, cache=None):
+    """Yield (path, html) for every path, one request at a time as the pages are consumed.
+    The html is None for a page that does not exist (404).
+    """
+    for path in paths:
+        yield path, fetch_listing_page(host, path, cache)
+
+
+def extract_pills(pages, backend=html_parser_backend):
+    """Yield the raw title, price and link of every pill on the pages.
+    Stops at the first missing page or page without a pill that was not seen before, which is how the catalog runs out.
+    """
+    seen_links = set()
+    for path, html_content in pages:
+        if html_content is None:
+            return
+        pills = [pill for pill in extract_listing(html_content, backend) if pill["link"] not in seen_links]
+        if not pills:
+            return
+        log.info(f"Listing page {path}: {len(pills)} products")
+        for pill in pills:
+            seen_links.add(pill["link"])
+            yield pill
+
+
+def _index_product_id(id_index, link, raw_id):
+    if raw_id is None:
+        return
+    try:
+        id_index.set(link, validate_id(raw_id))
+    except IndexError:
+        pass
+
+
+def fetch_details(pills, host=default_host, concurrency=detail_fetch_concurrency, id_index=None, backend=html_parser_backend):
+    """Yield every pill with the raw catalog item id of its detail page under "id", in input order.
+    At most `concurrency` detail pages are in flight. Links found in `id_index` are not fetched and
+    carry the stored int id instead. A page that can not be fetched gives id None and the reason under "error".
+    """
+    window = deque()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        try:
+            for pill in pills:
+                known_id = id_index.get(pill["link"]) if id_index is not None else None
+                if known_id is not None:
+                    window.append((pill, None, known_id))
+                else:
+                    window.append((pill, executor.submit(fetch_raw_product_id, host, pill["link"], backend), None))
+                # only block on the oldest page once the window is full, so fetches overlap
+                while len(window) > concurrency or (window and window[0][1] is None):
+                    yield _resolve(window.popleft(), id_index)
+            while window:
+                yield _resolve(window.popleft(), id_index)
+        finally:
+            for _, future, _ in window:
+                if future is not None:
+                    future.cancel()
+            if id_index is not None:
+                id_index.save()
+
+
+def _resolve(entry, id_index):
+    pill, future, product_id = entry
+    if future is not None:
+        try:
+            product_id = future.result()
+        except (OSError, HTTPError, HTTPStatusError) as e:
+            log.warning(f"Failed to fetch {pill['link']}: {e}")
+            return {**pill, "id": None, "error": str(e)}
+        if id_index is not None:
+            _index_product_id(id_index, pill["link"], product_id)
+    return {**pill, "id": product_id}
+
+
+def validate(pills):
+    """Yield products in the data layout, {"id", "name", "price": {"MDL": ...}, "specifications"}.
+    A product without an id is keyed by failed_product_key() and carries the reason under "error".
+    """
+    for pill in pills:
+        product = extract_product_from_pill(pill)
+        name, price, specifications = product["name"], product["price"], product["specifications"]
+        product_id = pill["id"]
+        error = pill.get("error", "ID not found") if product_id is None else None
+        if isinstance(product_id, str):
+            try:
+                product_id = validate_id(product_id)
+            except IndexError:
+                error = f"Malformed product id {product_id!r}"
+        if error is not None:
+            yield {
+                "id": failed_product_key(pill["link"]),
+                "name": name,
+                "price": {"MDL": price},
+                "specifications": specifications,
+                "error": error,
+            }
+            continue
+        yield {"id": product_id, "name": name, "price": {"MDL": price}, "specifications": specifications}
+
+
+def scrape(host=default_host, max_pages=0, cache=None, id_index=None, concurrency=detail_fetch_concurrency, backend=html_parser_backend):
+    """The whole pipeline from listing paths to validated products"""
+    pages = fetch_pages(listing_paths(max_pages=max_pages), host, cache)
+    pills = extract_pills(pages, backend)
+    return validate(fetch_details(pills, host, concurrency, id_index, backend))
+
+
+def collect(products, fetch_errors=None):
+    """Sink that gathers the products into the data layout used by task_9.
+    The reasons of failed fetches stay out of the data, they go to `fetch_errors` when a dict is given.
+    """
+    data = {"products": {}}
+    for product in products:
+        if "error" in product and fetch_errors is not None:
+            fetch_errors[product["id"]] = product["error"]
+        data["products"][product["id"]] = {
+            "name": product["name"],
+            "price": product["price"],
+            "specifications": product["specifications"],
+        }
+    return data
+
+
+def write_json(products, f):
+    """Sink that writes {"products": {...}} to a text file as the products arrive, returns the count"""
+    written = 0
+    f.write('{"products": {')
+    for product in products:
+        if written:
+            f.write(", ")
+        # keys are strings in JSON, like json.dumps does for the int ids of the data layout
+        f.write(json.dumps(str(product["id"])))
+        f.write(": ")
+        f.write(json.dumps(
+            {"name": product["name"], "price": product["price"], "specifications": product["specifications"]},
+            ensure_ascii=False,
+        ))
+        written += 1
+    f.write("}}")
+    return written
+
+
+def to_queue(products, queue):
+    """Sink that hands each product to a queue.Queue-like consumer, followed by None when done"""
+    try:
+        for product in products:
+            queue.put(product)
+    finally:
+        queue.put(None)
+
+
+if __name__ == "__main__":
+    import os
+
+    from http_client import default_pool
+    from ndjson_sink import compact, write_ndjson
+    from rate_control import AIMDController
+
+    logging.basicConfig(level=logging.INFO)
+    # with a limit set the request rate adapts to the site, DETAIL_FETCH_CONCURRENCY is fixed otherwise
+    adaptive_max_concurrency = int(os.getenv("ADAPTIVE_MAX_CONCURRENCY", 0))
+    concurrency = detail_fetch_concurrency
+    if adaptive_max_concurrency:
+        default_pool.controller = AIMDController(max_window=adaptive_max_concurrency)
+        concurrency = adaptive_max_concurrency
+    # products land in results.ndjson as they are scraped, results.json is rebuilt from it at the end
+    log.info(f"Stored {write_ndjson(scrape(concurrency=concurrency))} products")
+    if default_pool.controller is not None:
+        log.info(f"Rate control: {default_pool.controller.stats()}")
+    compact()
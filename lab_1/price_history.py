@@ -0,0 +1,284 @@
+"""Append-only price history of the scraped products.
+
+Every scrape appends one block holding only what changed since the previous one:
+
+    file header   magic "PRH1"
+    block         timestamp i64 (unix seconds), entry count u32, payload size u32, payload
+    entry         varint product id delta, varint zigzag price delta in cents << 1 | removed flag
+
+Entries are sorted by product id and ids are stored as the difference to the
+previous entry. Prices are stored in cents, as the difference to the last known
+price of the same product, and a product whose price did not change is not
+written at all, so a scrape of an unchanged catalog costs 16 bytes. A product
+that disappears from a scrape (or has no numeric price) gets a removed entry.
+
+The whole file is read on open into per product change lists sorted by time,
+which is the index that the range queries bisect.
+
+    python price_history.py record results.json
+    python price_history.py import snapshots/*.json
+    python price_history.py history 123456 --days 90
+    python price_history.py drops --days 7 --min-drop 0.1
+"""
+import argparse
+import json
+import os
+import struct
+from bisect import bisect_right
+from datetime import datetime, timedelta, timezone
+
+MAGIC = b"PRH1"
+BLOCK_HEADER = struct.Struct("<qII")
+
+
+def _encode_varint(value, out):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _decode_varint(buffer, offset):
+    result = 0
+    shift = 0
+    while True:
+        byte = buffer[offset]
+        offset += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, offset
+        shift += 7
+
+
+def _zigzag(value):
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def _unzigzag(value):
+    return value >> 1 if not value & 1 else -(value >> 1) - 1
+
+
+def _to_timestamp(when):
+    if when is None:
+        return int(datetime.now(timezone.utc).timestamp())
+    if isinstance(when, datetime):
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+        return int(when.timestamp())
+    return int(when)
+
+
+def _to_datetime(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc)
+
+
+def _price_cents(product, currency):
+    price = product.get("price") if isinstance(product, dict) else None
+    if isinstance(price, dict):
+        price = price.get(currency)
+    if isinstance(price, bool) or not isinstance(price, (int, float)):
+        return None
+    return round(price * 100)
+
+
+class PriceHistory:
+    """Price changes of every product over time, stored in `filename` and indexed in memory"""
+
+    def __init__(self, filename="price_history.bin", currency="MDL"):
+        self.filename = filename
+        self.currency = currency
+        # product id -> ([timestamps], [prices in cents or None]), one item per change
+        self.series = {}
+        self.current = {}
+        self.last_timestamp = None
+        self.valid_size = len(MAGIC)
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.filename, "rb") as f:
+                content = f.read()
+        except FileNotFoundError:
+            return
+        if not content:
+            return
+        if content[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{self.filename} is not a price history file")
+        offset = len(MAGIC)
+        while offset + BLOCK_HEADER.size <= len(content):
+            timestamp, count, size = BLOCK_HEADER.unpack_from(content, offset)
+            start = offset + BLOCK_HEADER.size
+            if start + size > len(content):
+                # a block cut short by a crash, it is overwritten by the next record()
+                break
+            self._apply(timestamp, self._decode_block(content, start, count))
+            offset = start + size
+        self.valid_size = offset
+
+    @staticmethod
+    def _decode_block(content, offset, count):
+        entries = []
+        product_id = 0
+        for _ in range(count):
+            id_delta, offset = _decode_varint(content, offset)
+            value, offset = _decode_varint(content, offset)
+            product_id += id_delta
+            entries.append((product_id, value & 1, _unzigzag(value >> 1)))
+        return entries
+
+    def _apply(self, timestamp, entries):
+        for product_id, removed, delta in entries:
+            times, prices = self.series.setdefault(product_id, ([], []))
+            if removed:
+                price = None
+                self.current.pop(product_id, None)
+            else:
+                price = self.current.get(product_id, 0) + delta
+                self.current[product_id] = price
+            times.append(timestamp)
+            prices.append(price)
+        self.last_timestamp = timestamp
+
+    def record(self, products, when=None):
+        """Append the prices of a scrape, `products` is the data["products"] mapping. Returns the entries written."""
+        timestamp = _to_timestamp(when)
+        if self.last_timestamp is not None and timestamp < self.last_timestamp:
+            raise ValueError("Snapshots have to be recorded in chronological order")
+        prices = {}
+        for product_id, product in products.items():
+            try:
+                product_id = int(product_id)
+            except (TypeError, ValueError):
+                # ids that could not be validated can not be followed between scrapes
+                continue
+            prices[product_id] = _price_cents(product, self.currency)
+
+        entries = []
+        for product_id in sorted(prices.keys() | self.current.keys()):
+            price = prices.get(product_id)
+            previous = self.current.get(product_id)
+            if price == previous:
+                continue
+            if price is None:
+                entries.append((product_id, 1, 0))
+            else:
+                entries.append((product_id, 0, price - (previous or 0)))
+
+        payload = bytearray()
+        previous_id = 0
+        for product_id, removed, delta in entries:
+            _encode_varint(product_id - previous_id, payload)
+            _encode_varint(_zigzag(delta) << 1 | removed, payload)
+            previous_id = product_id
+        self._append(BLOCK_HEADER.pack(timestamp, len(entries), len(payload)) + payload)
+        self._apply(timestamp, entries)
+        return len(entries)
+
+    def _append(self, block):
+        with open(self.filename, "r+b" if os.path.exists(self.filename) else "w+b") as f:
+            if self.last_timestamp is None:
+                f.write(MAGIC)
+            f.seek(self.valid_size)
+            f.truncate()
+            f.write(block)
+            f.flush()
+            os.fsync(f.fileno())
+        self.valid_size += len(block)
+
+    def product_ids(self):
+        return self.series.keys()
+
+    def price_at(self, product_id, when=None):
+        """Price in effect at `when`, None if the product was not listed then"""
+        series = self.series.get(product_id)
+        if series is None:
+            return None
+        times, prices = series
+        idx = bisect_right(times, _to_timestamp(when)) - 1
+        if idx < 0 or prices[idx] is None:
+            return None
+        return prices[idx] / 100
+
+    def history(self, product_id, start=None, end=None):
+        """Price changes of a product between `start` and `end` as (datetime, price) pairs.
+        The first pair is the change in effect at `start`, a None price means the product was not listed.
+        """
+        series = self.series.get(product_id)
+        if series is None:
+            return []
+        times, prices = series
+        first = 0 if start is None else max(0, bisect_right(times, _to_timestamp(start)) - 1)
+        last = len(times) if end is None else bisect_right(times, _to_timestamp(end))
+        return [
+            (_to_datetime(times[idx]), None if prices[idx] is None else prices[idx] / 100)
+            for idx in range(first, last)
+        ]
+
+    def price_drops(self, since, until=None, min_drop=0.10):
+        """Products whose price at `until` is at least `min_drop` (a fraction) below their price at `since`.
+        Returns (product_id, old price, new price, drop) tuples, the largest drop first.
+        """
+        since, until = _to_timestamp(since), _to_timestamp(until)
+        drops = []
+        for product_id, (times, prices) in self.series.items():
+            # products without a change since `since` can not have dropped
+            if times[-1] <= since:
+                continue
+            old, new = self.price_at(product_id, since), self.price_at(product_id, until)
+            if not old or new is None:
+                continue
+            drop = (old - new) / old
+            if drop >= min_drop:
+                drops.append((product_id, old, new, drop))
+        drops.sort(key=lambda item: item[3], reverse=True)
+        return drops
+
+
+def _snapshot_time(data, filename):
+    """Scrape time of a results.json snapshot, its file modification time when it has no statistics"""
+    timestamp = data.get("product_statistics", {}).get("timestamp")
+    if timestamp:
+        return datetime.fromisoformat(timestamp)
+    return datetime.fromtimestamp(os.path.getmtime(filename), timezone.utc)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", default=os.getenv("PRICE_HISTORY_FILE", "price_history.bin"))
+    commands = parser.add_subparsers(dest="command", required=True)
+    record = commands.add_parser("record", help="append a results.json snapshot, timestamped now")
+    record.add_argument("snapshot")
+    import_ = commands.add_parser("import", help="append old snapshots in the order they were taken")
+    import_.add_argument("snapshots", nargs="+")
+    history = commands.add_parser("history", help="price changes of one product")
+    history.add_argument("product_id", type=int)
+    history.add_argument("--days", type=int, default=90)
+    drops = commands.add_parser("drops", help="products whose price dropped")
+    drops.add_argument("--days", type=int, default=7)
+    drops.add_argument("--min-drop", type=float, default=0.10)
+    args = parser.parse_args()
+
+    store = PriceHistory(args.file)
+    now = datetime.now(timezone.utc)
+    if args.command == "record":
+        with open(args.snapshot, encoding="utf-8") as f:
+            print(f"{store.record(json.load(f)['products'])} changes recorded")
+    elif args.command == "import":
+        snapshots = []
+        for filename in args.snapshots:
+            with open(filename, encoding="utf-8") as f:
+                data = json.load(f)
+            snapshots.append((_snapshot_time(data, filename), data["products"]))
+        for when, products in sorted(snapshots, key=lambda snapshot: snapshot[0]):
+            store.record(products, when)
+        print(f"{len(snapshots)} snapshots imported")
+    elif args.command == "history":
+        for when, price in store.history(args.product_id, now - timedelta(days=args.days), now):
+            print(f"{when.isoformat()}  {'not listed' if price is None else price}")
+    else:
+        for product_id, old, new, drop in store.price_drops(now - timedelta(days=args.days), now, args.min_drop):
+            print(f"{product_id}  {old} -> {new}  -{drop:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+from datetime import datetime, timezone
+
+import numpy as np
+
+from exchange_rates import get_default_provider
+
+
+class ProductTable:
+    """Columnar view of data["products"]: one array per field instead of one dict per product.
+
+    Prices are kept per currency as float64 arrays, prices that are not numbers
+    (e.g. "Price not found") become NaN and never fall within a price range.
+    """
+
+    def __init__(self, ids, names, specifications, prices):
+        self.ids = ids
+        self.names = names
+        self.specifications = specifications
+        self.prices = prices
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_data(cls, data):
+        products = data["products"]
+        try:
+            ids = np.fromiter(products.keys(), dtype=np.int64, count=len(products))
+        except (TypeError, ValueError):
+            # ids that could not be validated are stored as strings by the scraper
+            ids = np.array(list(products.keys()), dtype=object)
+        names = np.array([product["name"] for product in products.values()], dtype=object)
+        specifications = np.array([product["specifications"] for product in products.values()], dtype=object)
+        currencies = next(iter(products.values()))["price"].keys() if products else ["MDL"]
+        prices = {
+            currency: np.fromiter(
+                (_as_price(product["price"].get(currency)) for product in products.values()),
+                dtype=np.float64,
+                count=len(products),
+            )
+            for currency in currencies
+        }
+        return cls(ids, names, specifications, prices)
+
+    def to_products(self):
+        """Rebuild the {product_id: product} mapping of the dict based implementation"""
+        currencies = list(self.prices)
+        price_columns = [self.prices[currency].tolist() for currency in currencies]
+        return {
+            product_id: {
+                "name": name,
+                "price": dict(zip(currencies, product_prices)),
+                "specifications": specifications,
+            }
+            for product_id, name, specifications, *product_prices in zip(
+                self.ids.tolist(), self.names.tolist(), self.specifications.tolist(), *price_columns
+            )
+        }
+
+    def to_data(self):
+        return {"products": self.to_products()}
+
+    def available_currencies(self):
+        return self.prices.keys()
+
+    def convert_price(self, currency, mdl_to_currency):
+        """Add a `currency` column from the MDL prices, `mdl_to_currency` is MDL per unit of `currency`"""
+        self.prices[currency] = self.prices["MDL"] / mdl_to_currency
+        return self
+
+    def convert_price_to_euro(self, mdl_to_euro):
+        return self.convert_price("EUR", mdl_to_euro)
+
+    def filter_price_range(self, min_price, max_price, currency="MDL"):
+        """Return a new table with the products priced within [min_price, max_price]"""
+        prices = self.prices[currency]
+        mask = (prices >= min_price) & (prices <= max_price)
+        return ProductTable(
+            self.ids[mask],
+            self.names[mask],
+            self.specifications[mask],
+            {column: values[mask] for column, values in self.prices.items()},
+        )
+
+    def sum_of_prices(self, currency="MDL"):
+        if not len(self):
+            return 0
+        # cumsum adds left to right like the reduce() in task_9, np.sum would use pairwise
+        # summation and could differ from it in the last bits
+        return float(np.cumsum(self.prices[currency])[-1])
+
+
+def _as_price(price):
+    return price if isinstance(price, (int, float)) else np.nan
+
+
+def filter_and_sum(table, min_price, max_price, currency="MDL", rates=None):
+    """Convert if needed, filter and sum without leaving the arrays, returns (filtered table, sum)"""
+    if currency not in table.available_currencies():
+        if rates is None:
+            rates = get_default_provider()
+        table.convert_price(currency, rates.mdl_per_unit(currency))
+    filtered = table.filter_price_range(min_price, max_price, currency)
+    return filtered, filtered.sum_of_prices(currency)
+
+
+def process_list_of_products(table, min_price, max_price, currency="MDL", rates=None):
+    """Columnar version of task_9.process_list_of_products.
+
+    Args:
+        table (ProductTable): The products
+        min_price (int): The minimum price
+        max_price (int): The maximum price
+        currency (str): The currency in which the prices are filtered
+        rates (ExchangeRateProvider): Rate table used for missing currencies, the shared provider by default
+
+    Returns:
+        dict: The filtered products with the sum computation, in the same layout as task_9
+    """
+    filtered, price_sum = filter_and_sum(table, min_price, max_price, currency, rates)
+    data = filtered.to_products()
+    data["product_statistics"] = {
+        "sum": price_sum,
+        "currency": currency,
+        "timestamp": datetime.now(timezone.utc),
+    }
+    return data
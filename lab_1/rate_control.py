@@ -0,0 +1,122 @@
+"""AIMD concurrency control for the scraper's requests.
+
+The controller is a semaphore whose size, the window, follows the responses:
+every healthy response grows it by about one request per window's worth of
+responses, a 429/5xx, a connection error or a p95 latency above the target
+halves it. Attach it to the connection pool so every fetch goes through it
+
+    default_pool.controller = AIMDController(max_window=32)
+
+and give the fetching code at least `max_window` threads, the controller is
+what keeps the requests in flight at the window.
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[int(fraction * (len(sorted_values) - 1))]
+
+
+class Observation:
+    """Outcome of one request, filled in by the code making it"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.responded = None
+        self.status = None
+        self.failed = False
+
+    def response(self, status):
+        """Record the response status, the latency is measured up to this call"""
+        self.responded = time.perf_counter()
+        self.status = status
+        if status == 429 or status >= 500:
+            self.failed = True
+
+    @property
+    def latency(self):
+        return (self.responded or time.perf_counter()) - self.started
+
+
+class AIMDController:
+    """Additive increase / multiplicative decrease limit on the requests in flight"""
+
+    def __init__(self, initial_window=4, min_window=1, max_window=32, increase=1.0, decrease=0.5,
+                 target_p95=2.0, sample_size=200):
+        self.window = float(initial_window)
+        self.min_window = min_window
+        self.max_window = max_window
+        self.increase = increase
+        self.decrease = decrease
+        self.target_p95 = target_p95
+        self.latencies = deque(maxlen=sample_size)
+        # p95 is only trusted once this many latencies have been seen since the last back-off
+        self.min_samples = max(1, sample_size // 10)
+        self.condition = threading.Condition()
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.backoffs = 0
+        self.last_backoff = 0
+
+    def acquire(self):
+        with self.condition:
+            while self.in_flight >= int(self.window):
+                self.condition.wait()
+            self.in_flight += 1
+
+    def release(self, latency, failed=False):
+        with self.condition:
+            self.in_flight -= 1
+            self.requests += 1
+            self.latencies.append(latency)
+            if failed:
+                self.errors += 1
+            slow = len(self.latencies) >= self.min_samples and self._p95() > self.target_p95
+            if failed or slow:
+                # the requests already in flight saw the same congestion, back off once per window of them
+                if self.requests - self.last_backoff >= self.window:
+                    self.window = max(self.min_window, self.window * self.decrease)
+                    self.backoffs += 1
+                    self.last_backoff = self.requests
+                    if slow:
+                        self.latencies.clear()
+            else:
+                self.window = min(self.max_window, self.window + self.increase / self.window)
+            self.condition.notify_all()
+
+    @contextmanager
+    def track(self):
+        """Hold a slot of the window for one request and yield its Observation"""
+        self.acquire()
+        observation = Observation()
+        try:
+            yield observation
+        except Exception:
+            # once the response is recorded the exception is the caller's, e.g. raise_for_status on a 404
+            if observation.responded is None:
+                observation.failed = True
+            raise
+        finally:
+            self.release(observation.latency, observation.failed)
+
+    def _p95(self):
+        return _percentile(sorted(self.latencies), 0.95)
+
+    def stats(self):
+        with self.condition:
+            latencies = sorted(self.latencies)
+            return {
+                "window": int(self.window),
+                "in_flight": self.in_flight,
+                "requests": self.requests,
+                "errors": self.errors,
+                "backoffs": self.backoffs,
+                "p50": _percentile(latencies, 0.5),
+                "p95": _percentile(latencies, 0.95),
+            }
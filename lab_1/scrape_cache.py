@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+import threading
+
+
+def _write_atomically(filename, content):
+    """Write to a temporary file first so a crash never leaves a truncated file behind"""
+    tmp_filename = f"{filename}.{os.getpid()}.{threading.get_ident()}.tmp"
+    mode = "wb" if isinstance(content, bytes) else "w"
+    with open(tmp_filename, mode) as f:
+        f.write(content)
+    os.replace(tmp_filename, filename)
+
+
+class ResponseCache:
+    """On-disk cache of response bodies keyed by URL and revalidated with ETag / Last-Modified"""
+
+    def __init__(self, directory=".scrape_cache"):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, url):
+        key = hashlib.sha1(url.encode()).hexdigest()
+        base = os.path.join(self.directory, key)
+        return f"{base}.json", f"{base}.body"
+
+    def get(self, url):
+        """Return the cached validators and body of `url`, or None when it is not cached"""
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                meta["body"] = f.read()
+        except (OSError, ValueError):
+            return None
+        return meta
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry is None:
+            return headers
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, url, response):
+        """Cache the response when the server gave us something to revalidate it with"""
+        etag = response.headers.get("etag")
+        last_modified = response.headers.get("last-modified")
+        if not etag and not last_modified:
+            return
+        meta_path, body_path = self._paths(url)
+        _write_atomically(body_path, bytes(response.body))
+        _write_atomically(meta_path, json.dumps({"url": url, "etag": etag, "last_modified": last_modified}))
+
+    def fetch(self, pool, host, path, port=None, tls=True):
+        """GET `path` with conditional headers and return the body, served from disk on 304.
+        Raises http_client.HTTPStatusError for a 4xx or 5xx response.
+        """
+        url = f"{'https' if tls else 'http'}://{host}{path}"
+        entry = self.get(url)
+        response = pool.request("GET", host, path, headers=self.conditional_headers(entry), port=port, tls=tls)
+        if response.status == 304 and entry is not None:
+            return entry["body"].decode("utf-8", errors="ignore")
+        response.raise_for_status()
+        if response.status == 200:
+            self.store(url, response)
+        return response.text
+
+
+class ProductIdIndex:
+    """Persistent mapping of product detail links to catalog item ids"""
+
+    def __init__(self, filename="product_ids.json"):
+        self.filename = filename
+        self.lock = threading.Lock()
+        self.dirty = False
+        try:
+            with open(filename, encoding="utf-8") as f:
+                self.ids = json.load(f)
+        except (OSError, ValueError):
+            self.ids = {}
+
+    def get(self, href):
+        return self.ids.get(href)
+
+    def set(self, href, product_id):
+        # only real ids are worth remembering, failed lookups should be retried next run
+        if not isinstance(product_id, int):
+            return
+        with self.lock:
+            if self.ids.get(href) != product_id:
+                self.ids[href] = product_id
+                self.dirty = True
+
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            _write_atomically(self.filename, json.dumps(self.ids, ensure_ascii=False))
+            self.dirty = False
@@ -8,7 +8,6 @@ import logging
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger(__name__)
 
-data = {"products": {}}
 
 def send_https_request(host, path):
     """Send HTTPS request using SSL socket"""
@@ -32,10 +31,8 @@ def send_https_request(host, path):
         return response_text[header_end_idx + 4:]
     return ""
 
-# Use the new function to get the HTML content
 host = 'www.cactus.md'
 path = '/ro/catalogue/electronice/kompyuternaya-tehnika/noutbuki/?sort_=ByView_Descending&page_=page_3&pageStart=1&pageEnd=3'
-html_content = send_https_request(host, path)
 
 def validate_price(price):
     """function to validate and convert price to float"""
@@ -64,31 +61,37 @@ def extract_product_specifications_from_product_title(product_title):
         specifications = ""
     return title, specifications
 
-soup = BeautifulSoup(html_content, 'html.parser')
-products = soup.find_all("div", class_="catalog__pill")
+def scrape_products():
+    """function to scrape the listing page and the product detail pages into the data layout"""
+    data = {"products": {}}
+    html_content = send_https_request(host, path)
+    soup = BeautifulSoup(html_content, 'html.parser')
+    products = soup.find_all("div", class_="catalog__pill")
+
+    for product in products:
+        title = product.find("h2").text
+        price_elem = product.find("div", class_="catalog__pill__controls__price")
+        if price_elem:
+            price = price_elem.text
+            price = validate_price(price)
+        else:
+            price = "Price not found"
+        name, specifications = extract_product_specifications_from_product_title(title)
+
+        further_link = product.find("a")["href"]
+        further_link_content = send_https_request(host, further_link)
+        further_link_soup = BeautifulSoup(further_link_content, 'html.parser')
+        id_elem = further_link_soup.find("div", class_="catalog__item__id")
+        if id_elem:
+            product_id = id_elem.text
+            product_id = validate_id(product_id)
+        else:
+            product_id = "ID not found"
+
+        log.info(f"Storing Product {product_id} name: {name}, price: {price}, specifications: {specifications}")
+        data["products"][product_id] = {"name": name, "price": {"MDL": price}, "specifications": specifications}
+    return data
 
-for product in products:
-    title = product.find("h2").text
-    price_elem = product.find("div", class_="catalog__pill__controls__price")
-    if price_elem:
-        price = price_elem.text
-        price = validate_price(price)
-    else:
-        price = "Price not found"
-    name, specifications = extract_product_specifications_from_product_title(title)
-
-    further_link = product.find("a")["href"]
-    further_link_content = send_https_request(host, further_link)
-    further_link_soup = BeautifulSoup(further_link_content, 'html.parser')
-    id_elem = further_link_soup.find("div", class_="catalog__item__id")
-    if id_elem:
-        product_id = id_elem.text
-        product_id = validate_id(product_id)
-    else:
-        product_id = "ID not found"
-    
-    log.info(f"Storing Product {product_id} name: {name}, price: {price}, specifications: {specifications}")
-    data["products"][product_id] = {"name": name, "price": {"MDL": price}, "specifications": specifications}
 
 def extract_current_mdl_to_euro_value():
     """function to extract current mdl to euro value"""
@@ -134,4 +137,6 @@ def process_list_of_products(data, min_price, max_price, currency="MDL"):
     data = attach_sum_computation_to_data(data, currency)
     return data
 
-print(process_list_of_products(data, 1000, 2000, currency="EUR"))
\ No newline at end of file
+if __name__ == "__main__":
+    data = scrape_products()
+    print(process_list_of_products(data, 1000, 2000, currency="EUR"))
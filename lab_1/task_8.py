@@ -1,7 +1,7 @@
 import json
-import socket
-import ssl
 from bs4 import BeautifulSoup
+from http_client import default_pool
+from xml_writer import iter_xml
 from functools import reduce
 from datetime import datetime, timezone
 import logging
@@ -9,34 +9,14 @@ import logging
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger(__name__)
 
-data = {"products": {}}
 
 def send_https_request(host, path):
-    """Send HTTPS request using SSL socket"""
-    port = 443
-    request = f"GET {path} HTTP/1.1\r\nHost: {host}\r\nUser-Agent: Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/129.0.0.0 Safari/537.36\r\nConnection: close\r\n\r\n"
-    
-    context = ssl.create_default_context()
-    with socket.create_connection((host, port)) as sock:
-        with context.wrap_socket(sock, server_hostname=host) as ssl_sock:
-            ssl_sock.sendall(request.encode())
-            response_data = b""
-            while True:
-                chunk = ssl_sock.recv(4096)
-                if not chunk:
-                    break
-                response_data += chunk
-    
-    response_text = response_data.decode('utf-8', errors='ignore')
-    header_end_idx = response_text.find("\r\n\r\n")
-    if header_end_idx != -1:
-        return response_text[header_end_idx + 4:]
-    return ""
-
-# Use the new function to get the HTML content
+    """Send HTTPS request over a pooled keep-alive connection"""
+    response = default_pool.request("GET", host, path)
+    return response.text
+
 host = 'www.cactus.md'
 path = '/ro/catalogue/electronice/kompyuternaya-tehnika/noutbuki/?sort_=ByView_Descending&page_=page_3&pageStart=1&pageEnd=3'
-html_content = send_https_request(host, path)
 
 def validate_price(price):
     """function to validate and convert price to float"""
@@ -65,31 +45,37 @@ def extract_product_specifications_from_product_title(product_title):
         specifications = ""
     return title, specifications
 
-soup = BeautifulSoup(html_content, 'html.parser')
-products = soup.find_all("div", class_="catalog__pill")
+def scrape_products():
+    """function to scrape the listing page and the product detail pages into the data layout"""
+    data = {"products": {}}
+    html_content = send_https_request(host, path)
+    soup = BeautifulSoup(html_content, 'html.parser')
+    products = soup.find_all("div", class_="catalog__pill")
+
+    for product in products:
+        title = product.find("h2").text
+        price_elem = product.find("div", class_="catalog__pill__controls__price")
+        if price_elem:
+            price = price_elem.text
+            price = validate_price(price)
+        else:
+            price = "Price not found"
+        name, specifications = extract_product_specifications_from_product_title(title)
+
+        further_link = product.find("a")["href"]
+        further_link_content = send_https_request(host, further_link)
+        further_link_soup = BeautifulSoup(further_link_content, 'html.parser')
+        id_elem = further_link_soup.find("div", class_="catalog__item__id")
+        if id_elem:
+            product_id = id_elem.text
+            product_id = validate_id(product_id)
+        else:
+            product_id = "ID not found"
+
+        log.info(f"Storing Product {product_id} name: {name}, price: {price}, specifications: {specifications}")
+        data["products"][product_id] = {"name": name, "price": {"MDL": price}, "specifications": specifications}
+    return data
 
-for product in products:
-    title = product.find("h2").text
-    price_elem = product.find("div", class_="catalog__pill__controls__price")
-    if price_elem:
-        price = price_elem.text
-        price = validate_price(price)
-    else:
-        price = "Price not found"
-    name, specifications = extract_product_specifications_from_product_title(title)
-
-    further_link = product.find("a")["href"]
-    further_link_content = send_https_request(host, further_link)
-    further_link_soup = BeautifulSoup(further_link_content, 'html.parser')
-    id_elem = further_link_soup.find("div", class_="catalog__item__id")
-    if id_elem:
-        product_id = id_elem.text
-        product_id = validate_id(product_id)
-    else:
-        product_id = "ID not found"
-    
-    log.info(f"Storing Product {product_id} name: {name}, price: {price}, specifications: {specifications}")
-    data["products"][product_id] = {"name": name, "price": {"MDL": price}, "specifications": specifications}
 
 def extract_current_mdl_to_euro_value():
     """function to extract current mdl to euro value"""
@@ -141,37 +127,10 @@ def to_json(data):
 
 def to_xml(data):
     """Convert dictionary to XML format with proper structure"""
-    def dict_to_xml(d):
-        xml_str = ""
-        for key, value in d.items():
-            if isinstance(value, dict):
-                # For nested dictionaries, use key as wrapper tag
-                if key == "products":
-                    # Special handling for products to create proper structure
-                    xml_str += f"<{key}>"
-                    for product_id, product_data in value.items():
-                        xml_str += f"<product id='{product_id}'>"
-                        xml_str += dict_to_xml(product_data)
-                        xml_str += "</product>"
-                    xml_str += f"</{key}>"
-                else:
-                    xml_str += f"<{key}>"
-                    xml_str += dict_to_xml(value)
-                    xml_str += f"</{key}>"
-            elif isinstance(value, (int, float)):
-                xml_str += f"<{key}>{value}</{key}>"
-            else:
-                # Handle strings and other types
-                xml_str += f"<{key}>{str(value)}</{key}>"
-        return xml_str
-
-    xml = '<?xml version="1.0" encoding="UTF-8"?>\n'
-    xml += "<data>"
-    xml += dict_to_xml(data)
-    xml += "</data>"
-    return xml
-
-log.info(f"Data: {data}")
-log.info(f"Data JSON: {to_json(data)}")
-log.info(f"Data XML: {to_xml(data)}")
+    return "".join(iter_xml(data))
 
+if __name__ == "__main__":
+    data = scrape_products()
+    log.info(f"Data: {data}")
+    log.info(f"Data JSON: {to_json(data)}")
+    log.info(f"Data XML: {to_xml(data)}")
@@ -1,42 +1,80 @@
 import json
-import socket
-import ssl
-from bs4 import BeautifulSoup
+import os
+import time
+from http_client import HTTPError, HTTPStatusError, default_pool
+from xml_writer import iter_xml, write_xml
+from binary_serialization import to_binary, from_binary
+from scrape_cache import ResponseCache, ProductIdIndex
+from extract import extract_listing, extract_product_id
+from exchange_rates import get_default_provider
+from price_history import PriceHistory
 from functools import reduce
 from datetime import datetime, timezone
 import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger(__name__)
 
-data = {"products": {}}
-
-def send_https_request(host, path):
-    """Send HTTPS request using SSL socket"""
-    port = 443
-    request = f"GET {path} HTTP/1.1\r\nHost: {host}\r\nUser-Agent: Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/129.0.0.0 Safari/537.36\r\nConnection: close\r\n\r\n"
-    
-    context = ssl.create_default_context()
-    with socket.create_connection((host, port)) as sock:
-        with context.wrap_socket(sock, server_hostname=host) as ssl_sock:
-            ssl_sock.sendall(request.encode())
-            response_data = b""
-            while True:
-                chunk = ssl_sock.recv(4096)
-                if not chunk:
-                    break
-                response_data += chunk
-    
-    response_text = response_data.decode('utf-8', errors='ignore')
-    header_end_idx = response_text.find("\r\n\r\n")
-    if header_end_idx != -1:
-        return response_text[header_end_idx + 4:]
-    return ""
-
-# Use the new function to get the HTML content
+def with_retries(function, *args, retries=None, backoff=None):
+    """function to call `function(*args)` again after connection errors and 429/5xx responses.
+    Waits `backoff` seconds before the first retry and twice as long before every next one,
+    the last error is raised once `retries` retries are used up.
+    """
+    retries = fetch_retries if retries is None else retries
+    backoff = fetch_retry_backoff if backoff is None else backoff
+    for attempt in range(retries + 1):
+        try:
+            return function(*args)
+        except (OSError, HTTPError, HTTPStatusError) as e:
+            if attempt == retries or (isinstance(e, HTTPStatusError) and not e.transient):
+                raise
+            delay = backoff * 2 ** attempt
+            log.warning(f"{e}, retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+def send_https_request(host, path, cache=None):
+    """Send HTTPS request over a pooled keep-alive connection.
+    With a ResponseCache the request is made conditional and unchanged pages are served from disk.
+    Transient failures are retried, other error responses raise HTTPStatusError.
+    """
+    def fetch():
+        if cache is not None:
+            return cache.fetch(default_pool, host, path)
+        response = default_pool.request("GET", host, path)
+        response.raise_for_status()
+        return response.text
+    return with_retries(fetch)
+
+def fetch_listing_page(host, path, cache=None):
+    """function to fetch a listing page, None once the page does not exist (404) and the catalog has run out"""
+    try:
+        return send_https_request(host, path, cache)
+    except HTTPStatusError as e:
+        if e.status == 404:
+            return None
+        raise
+
 host = 'www.cactus.md'
 path = '/ro/catalogue/electronice/kompyuternaya-tehnika/noutbuki/?sort_=ByView_Descending&page_=page_3&pageStart=1&pageEnd=3'
-html_content = send_https_request(host, path)
+listing_path_template = '/ro/catalogue/electronice/kompyuternaya-tehnika/noutbuki/?sort_=ByView_Descending&page_=page_{page}'
+# number of listing pages fetched at the same time while walking the catalog
+listing_fetch_concurrency = int(os.getenv("LISTING_FETCH_CONCURRENCY", 4))
+# number of processes parsing listing pages, defaults to one per core
+listing_parse_workers = int(os.getenv("LISTING_PARSE_WORKERS", os.cpu_count() or 1))
+# stop the catalog walk after this many listing pages, 0 walks until the catalog runs out
+max_listing_pages = int(os.getenv("MAX_LISTING_PAGES", 0))
+# maximum number of product detail pages fetched at the same time
+detail_fetch_concurrency = int(os.getenv("DETAIL_FETCH_CONCURRENCY", 8))
+# directory holding the conditional request cache and the href -> product id index
+scrape_cache_dir = os.getenv("SCRAPE_CACHE_DIR", ".scrape_cache")
+# retries of a request that failed with a connection error or a 429/5xx response, and the first delay in seconds
+fetch_retries = int(os.getenv("FETCH_RETRIES", 3))
+fetch_retry_backoff = float(os.getenv("FETCH_RETRY_BACKOFF", 0.5))
+# "html.parser" or "lxml", see extract.py
+html_parser_backend = os.getenv("HTML_PARSER_BACKEND", "html.parser")
+# every run appends the prices that changed since the previous run to this file
+price_history_file = os.getenv("PRICE_HISTORY_FILE", "price_history.bin")
 
 def validate_price(price):
     """function to validate and convert price to float"""
@@ -65,51 +103,173 @@ def extract_product_specifications_from_product_title(product_title):
         specifications = ""
     return title, specifications
 
-soup = BeautifulSoup(html_content, 'html.parser')
-products = soup.find_all("div", class_="catalog__pill")
-
-for product in products:
-    title = product.find("span", class_="catalog__pill__text__title").text
-    price_elem = product.find("div", class_="catalog__pill__controls__price")
-    if price_elem:
-        price = price_elem.text
-        price = validate_price(price)
+def extract_product_from_pill(pill):
+    """function to validate the raw title, price and detail link extracted from a catalog pill"""
+    if pill["price"] is not None:
+        price = validate_price(pill["price"])
     else:
         price = "Price not found"
-    name, specifications = extract_product_specifications_from_product_title(title)
-
-    further_link = product.find("a")["href"]
-    further_link_content = send_https_request(host, further_link)
-    further_link_soup = BeautifulSoup(further_link_content, 'html.parser')
-    id_elem = further_link_soup.find("div", class_="catalog__item__id")
-    if id_elem:
-        product_id = id_elem.text
-        product_id = validate_id(product_id)
-    else:
-        product_id = "ID not found"
-    
-    log.info(f"Storing Product {product_id} name: {name}, price: {price}, specifications: {specifications}")
-    data["products"][product_id] = {"name": name, "price": {"MDL": price}, "specifications": specifications}
-
-def extract_current_mdl_to_euro_value():
-    """function to extract current mdl to euro value"""
-    # html_content = send_https_request("www.bnm.md", "/ro")
-    # soup = BeautifulSoup(html_content, 'html.parser')
-    # exchange_rate_elem = soup.find("span", class_="currency", title="Euro")
-    # if exchange_rate_elem:
-    #     return float(exchange_rate_elem.text.replace(",", "."))
-    return 19.24  # fallback value
+    name, specifications = extract_product_specifications_from_product_title(pill["title"] or "")
+    return {"name": name, "price": price, "specifications": specifications, "link": pill["link"]}
+
+def fetch_raw_product_id(host, further_link, backend=html_parser_backend):
+    """function to fetch a product detail page and extract the raw catalog item id text, None if missing.
+    The page is parsed while it streams in and reading stops once the id element is complete.
+    Transient failures are retried, other error responses raise HTTPStatusError.
+    """
+    def fetch():
+        with default_pool.stream("GET", host, further_link) as response:
+            response.raise_for_status()
+            return extract_product_id(response.iter_chunks(), backend)
+    return with_retries(fetch)
+
+def fetch_product_id(host, further_link, backend=html_parser_backend):
+    """function to fetch a product detail page and extract its catalog item id"""
+    product_id = fetch_raw_product_id(host, further_link, backend)
+    if product_id is not None:
+        try:
+            return validate_id(product_id)
+        except IndexError:
+            log.warning(f"Malformed product id {product_id!r} on {further_link}")
+    return "ID not found"
+
+def try_fetch_product_id(host, further_link):
+    """function to fetch a product id, returns the exception instead of raising it when the page can not be fetched"""
+    try:
+        return fetch_product_id(host, further_link)
+    except (OSError, HTTPError, HTTPStatusError) as e:
+        log.warning(f"Failed to fetch {further_link}: {e}")
+        return e
+
+def failed_product_key(further_link):
+    """function to build the key of a product whose id is unknown, unlike "ID not found" it is unique per product"""
+    return f"ID not found: {further_link}"
+
+def fetch_product_ids(host, further_links, max_workers=detail_fetch_concurrency, id_index=None):
+    """function to fetch product ids from detail pages concurrently.
+    At most `max_workers` pages are in flight at once, ids are returned in the order of `further_links`.
+    Links already present in `id_index` are answered from it without touching the network.
+    A page that could not be fetched gets its exception in place of the id.
+    """
+    product_ids = [id_index.get(further_link) if id_index is not None else None for further_link in further_links]
+    missing = [idx for idx, product_id in enumerate(product_ids) if product_id is None]
+    if not missing:
+        return product_ids
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        fetched = executor.map(lambda idx: try_fetch_product_id(host, further_links[idx]), missing)
+        for idx, product_id in zip(missing, fetched):
+            product_ids[idx] = product_id
+            if id_index is not None:
+                id_index.set(further_links[idx], product_id)
+    log.info(f"Fetched {len(missing)} of {len(further_links)} product detail pages")
+    return product_ids
+
+def parse_listing_page(html_content, backend=html_parser_backend):
+    """function to extract the validated products of one listing page, runs in the parsing processes"""
+    return [extract_product_from_pill(pill) for pill in extract_listing(html_content, backend)]
+
+def build_products_data(host, products, max_workers=detail_fetch_concurrency, id_index=None, fetch_errors=None):
+    """function to resolve the product ids of listing products and store them in the data layout.
+    Products without an id are stored under failed_product_key(), the reasons are logged and kept out of
+    the data, which is serialized as is, they go to the `fetch_errors` dict keyed by link when one is given.
+    """
+    data = {"products": {}}
+    failed = 0
+    further_links = [product["link"] for product in products]
+    product_ids = fetch_product_ids(host, further_links, max_workers=max_workers, id_index=id_index)
+
+    for product, product_id in zip(products, product_ids):
+        if isinstance(product_id, Exception) or product_id == "ID not found":
+            log.warning(f"No id for {product['link']}: {product_id}")
+            if fetch_errors is not None:
+                fetch_errors[product["link"]] = str(product_id)
+            failed += 1
+            product_id = failed_product_key(product["link"])
+        name, price, specifications = product["name"], product["price"], product["specifications"]
+        log.info(f"Storing Product {product_id} name: {name}, price: {price}, specifications: {specifications}")
+        data["products"][product_id] = {"name": name, "price": {"MDL": price}, "specifications": specifications}
+    if id_index is not None:
+        id_index.save()
+    if failed:
+        log.warning(f"{failed} of {len(products)} products have no id")
+    return data
+
+def scrape_products(host, path, max_workers=detail_fetch_concurrency, cache=None, id_index=None, fetch_errors=None):
+    """function to scrape the listing page and its product detail pages into the data layout"""
+    html_content = send_https_request(host, path, cache)
+    products = parse_listing_page(html_content)
+    return build_products_data(host, products, max_workers=max_workers, id_index=id_index, fetch_errors=fetch_errors)
+
+def crawl_catalog(
+    host,
+    max_pages=max_listing_pages,
+    page_concurrency=listing_fetch_concurrency,
+    parse_workers=listing_parse_workers,
+    max_workers=detail_fetch_concurrency,
+    cache=None,
+    id_index=None,
+    fetch_errors=None,
+):
+    """function to walk the listing pages until the catalog runs out and scrape every product on them.
+    Pages are fetched `page_concurrency` at a time and parsed in a pool of `parse_workers` processes,
+    the walk stops at the first page that does not exist (404), has no products or no product that was
+    not seen before. A page that still fails after its retries raises instead of ending the walk early.
+    """
+    products = []
+    seen_links = set()
+    page = 1
+    with ThreadPoolExecutor(max_workers=page_concurrency) as fetch_executor, \
+            ProcessPoolExecutor(max_workers=parse_workers) as parse_executor:
+        while True:
+            pages = range(page, page + page_concurrency)
+            if max_pages:
+                pages = range(page, min(page + page_concurrency, max_pages + 1))
+            if not pages:
+                break
+            html_pages = fetch_executor.map(
+                lambda page_number: fetch_listing_page(host, listing_path_template.format(page=page_number), cache), pages
+            )
+            parsed_pages = [
+                parse_executor.submit(parse_listing_page, html_content) if html_content is not None else None
+                for html_content in html_pages
+            ]
+            exhausted = False
+            for page_number, parsed_page in zip(pages, parsed_pages):
+                if parsed_page is None:
+                    exhausted = True
+                    break
+                page_products = [product for product in parsed_page.result() if product["link"] not in seen_links]
+                if not page_products:
+                    exhausted = True
+                    break
+                log.info(f"Listing page {page_number}: {len(page_products)} products")
+                seen_links.update(product["link"] for product in page_products)
+                products.extend(page_products)
+            if exhausted:
+                break
+            page += len(pages)
+    return build_products_data(host, products, max_workers=max_workers, id_index=id_index, fetch_errors=fetch_errors)
+
+def extract_current_mdl_to_euro_value(rates=None):
+    """function to extract current mdl to euro value from the cached BNM rate table"""
+    if rates is None:
+        rates = get_default_provider()
+    return rates.mdl_per_unit("EUR")
 
 def filter_products_withing_price_range(data, min_price, max_price, currency="MDL"):
     """function to filter products within a price range"""
     return {product_id: product for product_id, product in data["products"].items() if min_price <= product["price"][currency] <= max_price}
 
-def convert_price_to_euro(data, mdl_to_euro):
-    """function to convert price to euro"""
+def convert_price(data, currency, mdl_to_currency):
+    """function to convert the MDL price to another currency, `mdl_to_currency` is MDL per unit of it"""
     for product_id, product in data["products"].items():
-        product["price"]["EUR"] = product["price"]["MDL"] / mdl_to_euro
+        product["price"][currency] = product["price"]["MDL"] / mdl_to_currency
     return data
 
+def convert_price_to_euro(data, mdl_to_euro):
+    """function to convert price to euro"""
+    return convert_price(data, "EUR", mdl_to_euro)
+
 def get_current_sum_of_prices(data, currency="MDL"):
     """function to get the current sum of prices"""
     return reduce(lambda x, y: x + y, [product["price"][currency] for _, product in data.items()]) if data else 0
@@ -124,13 +284,16 @@ def get_current_available_currencies(data):
     """function to get the current available currencies"""
     return list(data["products"].values())[0]["price"].keys()
 
-def process_list_of_products(data, min_price, max_price, currency="MDL"):
-    """Function that processes the list of products"""
-    if currency not in ["EUR", "MDL"]:
-        raise ValueError(f"Currency {currency} is not available")
+def process_list_of_products(data, min_price, max_price, currency="MDL", rates=None):
+    """Function that processes the list of products.
+    Any currency of the BNM rate table can be used, the rate is looked up once from the cached table.
+    """
+    if rates is None:
+        rates = get_default_provider()
     if currency not in get_current_available_currencies(data):
-        mdl_to_euro = extract_current_mdl_to_euro_value()
-        data = convert_price_to_euro(data, mdl_to_euro)
+        # raises ValueError for currencies missing from the rate table
+        mdl_to_currency = rates.mdl_per_unit(currency)
+        data = convert_price(data, currency, mdl_to_currency)
     data = filter_products_withing_price_range(data, min_price, max_price, currency)
     data = attach_sum_computation_to_data(data, currency)
     return data
@@ -142,35 +305,7 @@ def to_json(data):
 
 def to_xml(data):
     """Convert dictionary to XML format with proper structure"""
-    def dict_to_xml(d):
-        xml_str = ""
-        for key, value in d.items():
-            if isinstance(value, dict):
-                # For nested dictionaries, use key as wrapper tag
-                if key == "products":
-                    # Special handling for products to create proper structure
-                    xml_str += f"<{key}>"
-                    for product_id, product_data in value.items():
-                        xml_str += f"<product id='{product_id}'>"
-                        xml_str += dict_to_xml(product_data)
-                        xml_str += "</product>"
-                    xml_str += f"</{key}>"
-                else:
-                    xml_str += f"<{key}>"
-                    xml_str += dict_to_xml(value)
-                    xml_str += f"</{key}>"
-            elif isinstance(value, (int, float)):
-                xml_str += f"<{key}>{value}</{key}>"
-            else:
-                # Handle strings and other types
-                xml_str += f"<{key}>{str(value)}</{key}>"
-        return xml_str
-
-    xml = '<?xml version="1.0" encoding="UTF-8"?>\n'
-    xml += "<data>"
-    xml += dict_to_xml(data)
-    xml += "</data>"
-    return xml
+    return "".join(iter_xml(data))
 
 
 def to_custom_serialization(data, indent=0):
@@ -209,10 +344,9 @@ def to_custom_serialization(data, indent=0):
 def from_custom_serialization(text):
     """Deserialize data from the custom text format.
     Handles nested structures with proper type conversion.
+    `text` can be a string, a file object or any iterator of lines, which are read once,
+    front to back, so the parse takes time proportional to the input size.
     """
-    def count_indent(line):
-        return len(line) - len(line.lstrip())
-    
     def parse_value(value):
         value = value.strip()
         if not value:
@@ -236,99 +370,103 @@ def from_custom_serialization(text):
             except ValueError:
                 return value
 
-    def parse_list(lines, start_indent):
+    class LineStream:
+        """Single pass over the lines with one line of lookahead.
+        Each line is stripped once and kept as (line, indent, stripped line).
+        """
+        def __init__(self, lines):
+            self.lines = iter(lines)
+            self.current = None
+            self.advance()
+
+        def advance(self):
+            line = next(self.lines, None)
+            if line is None:
+                self.current = None
+                return
+            line = line.rstrip()
+            stripped = line.lstrip()
+            self.current = (line, len(line) - len(stripped), stripped)
+
+        def skip_blank(self):
+            while self.current is not None and not self.current[0]:
+                self.advance()
+            return self.current
+
+    def parse_list(stream, start_indent):
         result = []
-        i = 0
-        while i < len(lines):
-            line = lines[i].rstrip()
-            if not line or line.isspace():
-                i += 1
-                continue
-            
-            current_indent = count_indent(line)
-            if current_indent < start_indent:
+        while stream.skip_blank() is not None:
+            line, line_indent, stripped = stream.current
+            if line_indent < start_indent:
                 break
-                
-            if line.lstrip().startswith("- "):
-                value_str = line.lstrip()[2:].strip()
+
+            if stripped.startswith("- "):
+                value_str = stripped[2:].strip()
                 if "=" in value_str:
-                    # This is a dictionary item in the list
+                    # This is a dictionary item in the list, the following "- " lines only separate dictionaries
                     nested_dict = {}
-                    while i < len(lines):
-                        current_line = lines[i].rstrip()
-                        if not current_line or current_line.isspace():
-                            i += 1
-                            continue
-                        current_indent = count_indent(current_line)
+                    while stream.skip_blank() is not None:
+                        current_line, current_indent, current_stripped = stream.current
                         if current_indent < start_indent:
                             break
-                        if current_line.lstrip().startswith("- "):
+                        if current_stripped.startswith("- "):
                             if nested_dict:  # If we have collected a dictionary, add it
                                 result.append(nested_dict)
                                 nested_dict = {}
-                            i += 1
-                            continue
-                        
-                        if "=" in current_line:
-                            key, value = current_line.lstrip().split("=", 1)
+                        elif "=" in current_line:
+                            key, value = current_stripped.split("=", 1)
                             nested_dict[key.strip()] = parse_value(value)
-                        i += 1
+                        stream.advance()
                     if nested_dict:  # Add the last dictionary
                         result.append(nested_dict)
                 else:
                     result.append(parse_value(value_str))
-                    i += 1
+                    stream.advance()
             else:
-                i += 1
-                
-        return result, i
+                stream.advance()
+
+        return result
 
-    def parse_structure(lines, current_indent=0):
+    def parse_structure(stream, current_indent=0):
         result = {}
-        i = 0
-        while i < len(lines):
-            line = lines[i].rstrip()
-            if not line or line.isspace():
-                i += 1
-                continue
-                
-            line_indent = count_indent(line)
+        while stream.skip_blank() is not None:
+            line, line_indent, stripped = stream.current
             if line_indent < current_indent:
                 break
-                
-            if "=" in line:
-                key, value = line.split("=", 1)
-                key = key.strip()
-                value = value.strip()
-                
-                if value:
-                    result[key] = parse_value(value)
-                    i += 1
-                else:
-                    # Check next line's indentation to determine if it's a list or dict
-                    next_line_idx = i + 1
-                    while next_line_idx < len(lines):
-                        next_line = lines[next_line_idx].rstrip()
-                        if next_line and not next_line.isspace():
-                            if next_line.lstrip().startswith("- "):
-                                nested_value, consumed = parse_list(lines[next_line_idx:], 
-                                                                 count_indent(next_line))
-                                result[key] = nested_value
-                            else:
-                                nested_value, consumed = parse_structure(lines[next_line_idx:], 
-                                                                      count_indent(next_line))
-                                result[key] = nested_value
-                            i = next_line_idx + consumed
-                            break
-                        next_line_idx += 1
-                        i += 1
+
+            stream.advance()
+            if "=" not in line:
+                continue
+            key, value = line.split("=", 1)
+            key = key.strip()
+            value = value.strip()
+            if value:
+                result[key] = parse_value(value)
+                continue
+
+            # Check next line's indentation to determine if it's a list or dict
+            next_line = stream.skip_blank()
+            if next_line is None:
+                break
+            if next_line[2].startswith("- "):
+                result[key] = parse_list(stream, next_line[1])
             else:
-                i += 1
-                
-        return result, i
+                result[key] = parse_structure(stream, next_line[1])
+
+        return result
 
-    lines = text.split('\n')
-    return parse_structure(lines)[0]
+    lines = text.split('\n') if isinstance(text, str) else text
+    return parse_structure(LineStream(lines))
+
+
+def to_binary_serialization(data):
+    """Serialize data to the compact binary format, see binary_serialization.py for the layout"""
+    return to_binary(data)
+
+
+def from_binary_serialization(buffer):
+    """Deserialize data from the binary format, `buffer` can be bytes, a memoryview or an mmap"""
+    return from_binary(buffer)
 
 
 def save_to_json(data, filename='results.json'):
@@ -342,13 +480,26 @@ def save_to_json(data, filename='results.json'):
     with open(filename, 'w', encoding='utf-8') as f:
         json.dump(data, f, cls=DateTimeEncoder, ensure_ascii=False, indent=4)
 
+def save_to_xml(data, filename='results.xml'):
+    """Stream data to an XML file without building the document in memory"""
+    with open(filename, 'w', encoding='utf-8') as f:
+        write_xml(data, f)
+
 if __name__ == "__main__":
+    data = crawl_catalog(
+        host,
+        cache=ResponseCache(scrape_cache_dir),
+        id_index=ProductIdIndex(os.path.join(scrape_cache_dir, "product_ids.json")),
+    )
     log.info(f"Data: {data}")
     log.info(f"Data serialized: \n{to_custom_serialization(data)}")
     log.info(f"Data deserialized: {from_custom_serialization(to_custom_serialization(data))}")
     log.info(f"Data serialized to JSON: {to_json(data)}")
     log.info(f"Data serialized to XML: {to_xml(data)}")
+    log.info(f"Data serialized to binary: {len(to_binary_serialization(data))} bytes")
     save_to_json(data)
     log.info("Results saved to results.json")
+    changes = PriceHistory(price_history_file).record(data["products"])
+    log.info(f"{changes} price changes appended to {price_history_file}")
 
 
@@ -0,0 +1,43 @@
+import os
+import time
+
+from exchange_rates import REFRESH_BACKOFF, ExchangeRateProvider
+
+
+class FailingFetch:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        raise OSError("BNM is down")
+
+
+def wait_for_refresh(provider, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while provider.refreshing and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_failed_refresh_backs_off(tmp_path):
+    fetch = FailingFetch()
+    provider = ExchangeRateProvider(cache_file=os.path.join(tmp_path, "rates.json"), ttl=3600, fetch=fetch)
+    for _ in range(100):
+        assert provider.rate("EUR", "MDL") == 19.24
+        wait_for_refresh(provider)
+    # the first lookup waits for one fetch, the stale table is not fetched again until the backoff passed
+    assert fetch.calls == 1
+    assert provider.retry_at - time.time() > REFRESH_BACKOFF - 1
+
+    provider.retry_at = 0.0
+    provider.rate("EUR", "MDL")
+    wait_for_refresh(provider)
+    assert fetch.calls == 2
+    assert provider.retry_at - time.time() > 2 * REFRESH_BACKOFF - 1
+
+    provider.retry_at = 0.0
+    provider.fetch = lambda: {"MDL": 1.0, "EUR": 20.0}
+    provider.rate("EUR", "MDL")
+    wait_for_refresh(provider)
+    assert provider.failures == 0
+    assert provider.rate("EUR", "MDL") == 20.0
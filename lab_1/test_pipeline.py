@@ -0,0 +1,17 @@
+from pipeline import validate
+from task_9 import failed_product_key
+
+
+def pill(link, product_id):
+    return {"link": link, "title": "Laptop Lenovo, 16GB/512GB", "price": "15 999 lei", "id": product_id}
+
+
+def test_validate_marks_malformed_ids_as_errors():
+    products = list(validate([pill("/ro/a/", "Cod\xa0123"), pill("/ro/b/", "Cod 456"), pill("/ro/c/", None)]))
+
+    assert [product["id"] for product in products] == [
+        123, failed_product_key("/ro/b/"), failed_product_key("/ro/c/"),
+    ]
+    assert "error" not in products[0]
+    assert "Cod 456" in products[1]["error"]
+    assert products[2]["error"] == "ID not found"
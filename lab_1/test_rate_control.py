@@ -0,0 +1,33 @@
+import pytest
+
+from fixture_server import FixtureServer
+from http_client import ConnectionPool, HTTPStatusError
+from rate_control import AIMDController
+
+HOST = "www.example.test"
+
+
+def stream_many(error_rate, count=40):
+    controller = AIMDController(initial_window=4, max_window=4)
+    pool = ConnectionPool(controller=controller)
+    with FixtureServer({}, error_rate=error_rate) as server:
+        pool.route(HOST, server.address, server.port)
+        for _ in range(count):
+            with pytest.raises(HTTPStatusError):
+                with pool.stream("GET", HOST, "/missing") as response:
+                    response.raise_for_status()
+        pool.close()
+    return controller
+
+
+def test_streamed_404_is_not_a_failure():
+    controller = stream_many(error_rate=0.0)
+    assert controller.errors == 0
+    assert controller.backoffs == 0
+    assert controller.stats()["window"] == 4
+
+
+def test_streamed_503_is_a_failure():
+    controller = stream_many(error_rate=1.0)
+    assert controller.errors == 40
+    assert controller.backoffs > 0
@@ -0,0 +1,28 @@
+import xml.etree.ElementTree as ET
+
+import task_9
+from fixture_server import FixtureServer, generate_fixtures
+from http_client import default_pool
+from task_9 import build_products_data, parse_listing_page, to_xml
+
+
+def test_to_xml_with_failed_fetch(monkeypatch):
+    monkeypatch.setattr(task_9, "fetch_retries", 0)
+    fixtures = generate_fixtures(pages=1, products_per_page=2)
+    products = parse_listing_page(fixtures[task_9.listing_path_template.format(page=1)])
+    # no detail page behind this link, its fetch fails with a 404
+    products.append({**products[0], "link": "/ro/a&b'<c>/"})
+    fetch_errors = {}
+    with FixtureServer(fixtures) as server:
+        default_pool.route(task_9.host, server.address, server.port)
+        try:
+            data = build_products_data(task_9.host, products, max_workers=2, fetch_errors=fetch_errors)
+        finally:
+            default_pool.unroute(task_9.host)
+
+    assert list(fetch_errors) == ["/ro/a&b'<c>/"]
+    assert "fetch_errors" not in data
+    root = ET.fromstring(to_xml(data).encode("utf-8"))
+    ids = [product.get("id") for product in root.iter("product")]
+    assert len(ids) == 3
+    assert task_9.failed_product_key("/ro/a&b'<c>/") in ids
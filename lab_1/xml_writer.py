@@ -0,0 +1,58 @@
+import io
+from xml.sax.saxutils import escape
+
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8"?>\n'
+_ENTITIES = {'"': "&quot;", "'": "&apos;"}
+
+
+def _escape(value):
+    return escape(str(value), _ENTITIES)
+
+
+def _iter_dict(d):
+    for key, value in d.items():
+        if isinstance(value, dict):
+            yield f"<{key}>"
+            if key == "products":
+                # products are keyed by id, which becomes an attribute of a <product> element
+                for product_id, product_data in value.items():
+                    yield f"<product id='{_escape(product_id)}'>"
+                    yield from _iter_dict(product_data)
+                    yield "</product>"
+            else:
+                yield from _iter_dict(value)
+            yield f"</{key}>"
+        else:
+            yield f"<{key}>{_escape(value)}</{key}>"
+
+
+def iter_xml(data):
+    """Yield the XML document of `data` piece by piece, in the <data><products><product id=...> layout"""
+    yield XML_DECLARATION
+    yield "<data>"
+    yield from _iter_dict(data)
+    yield "</data>"
+
+
+def write_xml(data, out, buffer_size=65536):
+    """Write the XML document of `data` to a text file, binary file or socket in bounded memory.
+    Pieces are batched into writes of about `buffer_size` characters.
+    """
+    if hasattr(out, "sendall"):
+        write = lambda text: out.sendall(text.encode("utf-8"))
+    elif isinstance(out, io.TextIOBase):
+        write = out.write
+    else:
+        write = lambda text: out.write(text.encode("utf-8"))
+
+    pending = []
+    pending_size = 0
+    for piece in iter_xml(data):
+        pending.append(piece)
+        pending_size += len(piece)
+        if pending_size >= buffer_size:
+            write("".join(pending))
+            pending.clear()
+            pending_size = 0
+    if pending:
+        write("".join(pending))
@@ -0,0 +1,73 @@
+from sqlalchemy import case, delete, update
+
+from db.models import Product
+from responses import select_product_rows
+
+MAX_BATCH_SIZE = 1000
+PATCHABLE_FIELDS = ("name", "price", "specifications")
+NOT_NULL_FIELDS = ("name", "price")
+
+
+class BatchError(ValueError):
+    pass
+
+
+def parse_ids(ids):
+    """Parse the comma separated ids of ?ids=1,2,3, keeping their order and dropping duplicates"""
+    try:
+        parsed = [int(product_id) for product_id in ids.split(",") if product_id.strip()]
+    except ValueError:
+        raise BatchError("ids must be a comma separated list of integers")
+    return check_ids(parsed)
+
+
+def check_ids(ids):
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        raise BatchError("No ids given")
+    if len(ids) > MAX_BATCH_SIZE:
+        raise BatchError(f"At most {MAX_BATCH_SIZE} ids per request")
+    return ids
+
+
+def select_many(ids):
+    return select_product_rows().where(Product.id.in_(ids))
+
+
+def update_many(patches):
+    """One UPDATE for all the partial updates, every column gets a CASE over the ids that set it.
+
+    `patches` maps product id to the fields to change. Returns the statement, which returns the updated rows.
+    """
+    values = {}
+    for field in PATCHABLE_FIELDS:
+        whens = {product_id: fields[field] for product_id, fields in patches.items() if field in fields}
+        if whens:
+            column = getattr(Product, field)
+            values[field] = case(whens, value=Product.id, else_=column)
+    statement = update(Product).where(Product.id.in_(list(patches)))
+    if values:
+        statement = statement.values(**values)
+    else:
+        # nothing to change, a no-op assignment still returns which ids exist
+        statement = statement.values(id=Product.id)
+    return statement.returning(Product)
+
+
+def delete_many(ids):
+    return delete(Product).where(Product.id.in_(ids)).returning(Product.id)
+
+
+def check_patches(patches):
+    """Validate a list of {"id", fields...} partial updates and key them by id"""
+    by_id = {}
+    for patch in patches:
+        product_id = patch.pop("id")
+        if product_id in by_id:
+            raise BatchError(f"Product {product_id} is patched more than once")
+        for field in NOT_NULL_FIELDS:
+            if field in patch and patch[field] is None:
+                raise BatchError(f"Product {product_id}: {field} can not be null")
+        by_id[product_id] = patch
+    check_ids(list(by_id))
+    return by_id
@@ -0,0 +1,122 @@
+"""Benchmark the serialization of a GET /products/ page, per response.
+
+    python bench_responses.py --sizes 1,10,100,1000 --output bench_responses.json
+
+Every case turns the same page of products into the bytes of a response:
+
+    orm             ORM instances through jsonable_encoder and JSONResponse (the original handlers)
+    dicts           plain dicts through jsonable_encoder and JSONResponse
+    response_model  ORM instances validated and dumped by the ProductPage response model
+    orjson_rows     row tuples encoded by orjson (the current handlers on a cache miss)
+    cached          an already encoded body wrapped in a response (a cache hit)
+
+The rows come from an in-memory SQLite database, the database time is not measured.
+"""
+import argparse
+import json
+import os
+import timeit
+
+os.environ.setdefault("POSTGRES_URL", "sqlite://")
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+
+from db.models import Product
+from product_cache import product_to_dict
+from responses import JSONBytesResponse, ProductPage, dump_json, rows_to_dicts, select_product_rows
+
+SPECIFICATIONS = [None, "2023", "16GB/512GB", "8GB/256GB, \"15.6\" display"]
+
+
+def load_page(size):
+    """The same page as ORM instances and as row tuples"""
+    engine = create_engine("sqlite://")
+    Product.__table__.create(engine)
+    with engine.begin() as connection:
+        connection.execute(insert(Product), [
+            {
+                "name": f"Laptop {idx} «ultrabook»",
+                "price": 5000 + idx * 1.25,
+                "specifications": SPECIFICATIONS[idx % len(SPECIFICATIONS)],
+            }
+            for idx in range(size)
+        ])
+    with Session(engine) as session:
+        products = session.scalars(select(Product).order_by(Product.id)).all()
+        # keep the instances readable after the session is closed, like expire_on_commit=False
+        session.expunge_all()
+    with engine.connect() as connection:
+        rows = connection.execute(select_product_rows().order_by(Product.id)).all()
+    engine.dispose()
+    return products, rows
+
+
+def page(items):
+    return {"items": items, "offset": 0, "limit": len(items), "next_cursor": None}
+
+
+def make_cases(products, rows):
+    adapter = TypeAdapter(ProductPage)
+    body = dump_json(page(rows_to_dicts(rows)))
+    return {
+        "orm": lambda: JSONResponse(jsonable_encoder(page(products))).body,
+        "dicts": lambda: JSONResponse(jsonable_encoder(page([product_to_dict(product) for product in products]))).body,
+        # what FastAPI does for a declared response_model: validate, dump to JSON types, render
+        "response_model": lambda: JSONResponse(
+            adapter.dump_python(adapter.validate_python(page(products), from_attributes=True), mode="json")
+        ).body,
+        "orjson_rows": lambda: JSONBytesResponse(dump_json(page(rows_to_dicts(rows)))).body,
+        "cached": lambda: JSONBytesResponse(body).body,
+    }
+
+
+def per_call(function, repeat, min_time=0.2):
+    """Best time of one call over `repeat` rounds, each round long enough to be measured reliably"""
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    number = max(number, int(number * min_time / 0.2))
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1,10,100,1000", help="products per page")
+    parser.add_argument("--repeat", type=int, default=5, help="timed rounds per case, the best one is reported")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'case':<16}{'products':>10}{'us/response':>14}{'speedup':>10}{'bytes':>10}")
+    for size in (int(size) for size in args.sizes.split(",")):
+        products, rows = load_page(size)
+        cases = make_cases(products, rows)
+        outputs = {name: case() for name, case in cases.items()}
+        # every case has to produce the same document
+        expected = json.loads(outputs["orm"])
+        for name, output in outputs.items():
+            assert json.loads(output) == expected, name
+
+        baseline = None
+        for name, case in cases.items():
+            seconds = per_call(case, args.repeat)
+            baseline = baseline or seconds
+            results.append({
+                "case": name,
+                "products": size,
+                "seconds_per_response": seconds,
+                "speedup": baseline / seconds,
+                "output_bytes": len(outputs[name]),
+            })
+            print(f"{name:<16}{size:>10}{seconds * 1e6:>14.1f}{baseline / seconds:>9.1f}x{len(outputs[name]):>10}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"repeat": args.repeat, "results": results}, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+import codecs
+import io
+import json
+import logging
+import os
+
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import DBAPIError
+
+from db.models import Product
+from versioning import bump_versions, defer_version_bump
+
+log = logging.getLogger(__name__)
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 1000))
+# rows committed per transaction, a failure only rolls back the current one
+IMPORT_TRANSACTION_SIZE = int(os.getenv("IMPORT_TRANSACTION_SIZE", 10000))
+MAX_REPORTED_ERRORS = 1000
+READ_SIZE = 1 << 16
+# a single product larger than this is treated as malformed input instead of being buffered
+MAX_ITEM_SIZE = 1 << 24
+
+_WHITESPACE = " \t\n\r"
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def iter_json_array(read, read_size=READ_SIZE):
+    """Yield the items of a JSON array read from `read(size) -> bytes` without loading the whole document"""
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    position = 0
+    eof = False
+
+    def fill():
+        """Drop the consumed text and append the next chunk, False once the input is exhausted"""
+        nonlocal buffer, position, eof
+        if eof:
+            return False
+        chunk = read(read_size)
+        eof = not chunk
+        buffer = buffer[position:] + utf8.decode(chunk, final=eof)
+        position = 0
+        return True
+
+    def next_char():
+        """Skip whitespace and return the next character, None at the end of the input"""
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in _WHITESPACE:
+                position += 1
+            if position < len(buffer):
+                return buffer[position]
+            if not fill():
+                return None
+
+    if next_char() != "[":
+        raise ImportFormatError("Expected a list of products")
+    position += 1
+    if next_char() == "]":
+        return
+    while True:
+        if next_char() is None:
+            raise ImportFormatError("Unexpected end of the JSON array")
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError as e:
+            # the item may continue past the buffer, read more and try again
+            if len(buffer) - position < MAX_ITEM_SIZE and fill():
+                continue
+            raise ImportFormatError(f"Invalid JSON: {e}")
+        if buffer[end:].lstrip(_WHITESPACE)[:1] not in (",", "]") and fill():
+            # a number cut at the end of the buffer (e.g. "1.5" of "1.5e3") may go on in the next chunk
+            continue
+        position = end
+        yield item
+        char = next_char()
+        if char == "]":
+            return
+        if char != ",":
+            raise ImportFormatError("Expected ',' or ']' after an item of the JSON array")
+        position += 1
+
+
+def _batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _validate_batch(adapter, schema, batch):
+    """Validate a batch at once, falling back to row by row only when it contains invalid rows.
+    Returns the valid rows, their indexes in the batch and (index, errors) of the invalid ones.
+    """
+    try:
+        return [product.model_dump() for product in adapter.validate_python(batch)], range(len(batch)), []
+    except ValidationError:
+        pass
+    rows, indexes, errors = [], [], []
+    for idx, item in enumerate(batch):
+        try:
+            rows.append(schema.model_validate(item).model_dump())
+            indexes.append(idx)
+        except ValidationError as e:
+            errors.append((idx, e.errors(include_url=False, include_context=False)))
+    return rows, indexes, errors
+
+
+def _csv_field(value):
+    """CSV field for COPY, NULL is the unquoted empty field and strings are always quoted so "" stays a string"""
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return '"' + value.replace('"', '""') + '"'
+    return str(value)
+
+
+def _copy_rows(connection, rows):
+    """Load rows with PostgreSQL COPY through the psycopg2 cursor of the current transaction"""
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(",".join(_csv_field(row[column]) for column in columns))
+        buffer.write("\n")
+    buffer.seek(0)
+    cursor = connection.connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {Product.__tablename__} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+
+def _insert_rows(connection, rows):
+    if connection.dialect.name == "postgresql" and connection.dialect.driver == "psycopg2":
+        _copy_rows(connection, rows)
+    else:
+        # Core executemany, no ORM objects or identity map
+        connection.execute(insert(Product), rows)
+
+
+def _insert_batch(connection, rows, indexes):
+    """Insert a batch inside a savepoint. When the database rejects it the batch is inserted again
+    row by row, so only the failing rows are lost. Returns the inserted count and (index, errors) of the rest.
+    """
+    savepoint = connection.begin_nested()
+    try:
+        _insert_rows(connection, rows)
+        savepoint.commit()
+        return len(rows), []
+    except (DBAPIError, connection.dialect.dbapi.Error):
+        # copy_expert runs on the raw psycopg2 cursor, its errors are not wrapped in DBAPIError
+        savepoint.rollback()
+    inserted, errors = 0, []
+    for idx, row in zip(indexes, rows):
+        savepoint = connection.begin_nested()
+        try:
+            connection.execute(insert(Product), row)
+            savepoint.commit()
+            inserted += 1
+        except DBAPIError as e:
+            savepoint.rollback()
+            errors.append((idx, [{"type": "database_error", "msg": str(e.orig).strip()}]))
+    return inserted, errors
+
+
+def _begin(connection):
+    """Begin an import transaction, it bumps the table version once before its commit instead of per statement"""
+    transaction = connection.begin()
+    defer_version_bump(connection)
+    return transaction
+
+
+def import_products(engine, read, schema, batch_size=IMPORT_BATCH_SIZE, transaction_size=IMPORT_TRANSACTION_SIZE):
+    """Stream a JSON array of products from `read` into the product table.
+
+    Items are validated against `schema` in batches and written in transactions of about
+    `transaction_size` rows. Rows that fail validation or are rejected by the database are reported and skipped.
+    Returns {"imported", "failed", "errors"}, errors are capped at MAX_REPORTED_ERRORS.
+    """
+    adapter = TypeAdapter(list[schema])
+    imported = failed = 0
+    errors = []
+    row_offset = 0
+    pending = 0
+    connection = engine.connect()
+    transaction = _begin(connection)
+    try:
+        for batch in _batches(iter_json_array(read), batch_size):
+            rows, indexes, batch_errors = _validate_batch(adapter, schema, batch)
+            if rows:
+                inserted, insert_errors = _insert_batch(connection, rows, indexes)
+                pending += inserted
+                batch_errors = sorted(batch_errors + insert_errors, key=lambda error: error[0])
+            for idx, row_errors in batch_errors:
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({"row": row_offset + idx, "errors": row_errors})
+            failed += len(batch_errors)
+            row_offset += len(batch)
+            if pending >= transaction_size:
+                bump_versions(connection)
+                transaction.commit()
+                imported += pending
+                pending = 0
+                log.info(f"Import progress: {imported} products imported, {failed} rows rejected")
+                transaction = _begin(connection)
+        bump_versions(connection)
+        transaction.commit()
+        imported += pending
+    except ImportFormatError as e:
+        transaction.rollback()
+        raise ImportFormatError(f"{e}, {imported} products were imported before it")
+    except BaseException:
+        transaction.rollback()
+        raise
+    finally:
+        connection.close()
+    log.info(f"Import finished: {imported} products imported, {failed} rows rejected")
+    return {"imported": imported, "failed": failed, "errors": errors}
@@ -1,4 +1,5 @@
 from db.models.product import Product
+from db.models.table_version import TableVersion
 from db.models.user import User
 
-__all__ = ["Product", "User"]
\ No newline at end of file
+__all__ = ["Product", "TableVersion", "User"]
\ No newline at end of file
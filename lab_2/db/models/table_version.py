@@ -0,0 +1,16 @@
+from db.base import Base
+from sqlalchemy import Column, String, BigInteger
+
+
+class TableVersion(Base):
+    """Change counter of a table, bumped by database triggers on every write to it"""
+    __tablename__ = "table_version"
+
+    name = Column(
+        String,
+        primary_key=True,
+    )
+    version = Column(
+        BigInteger,
+        nullable=False,
+    )
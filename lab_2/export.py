@@ -0,0 +1,60 @@
+import csv
+import io
+import os
+import zlib
+
+import orjson
+
+from db.models import Product
+from responses import PRODUCT_FIELDS, row_to_dict, select_product_rows
+
+# rows fetched from the server-side cursor at a time, the memory of an export does not grow past it
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", 1000))
+GZIP_LEVEL = 6
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def _encode_ndjson(rows):
+    return b"".join(orjson.dumps(row_to_dict(row)) + b"\n" for row in rows)
+
+
+def _encode_csv(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+def _csv_header():
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(PRODUCT_FIELDS)
+    return buffer.getvalue().encode("utf-8")
+
+
+async def export_products(engine, export_format="ndjson", gzip=False, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield the whole product table ordered by id as NDJSON or CSV chunks.
+
+    The rows come from a single query over a server-side cursor, so the export is one
+    consistent snapshot. With `gzip` the chunks form a gzip stream.
+    """
+    encode = _encode_ndjson if export_format == "ndjson" else _encode_csv
+    compressor = zlib.compressobj(GZIP_LEVEL, wbits=16 + zlib.MAX_WBITS) if gzip else None
+
+    def output(data):
+        return compressor.compress(data) if compressor else data
+
+    if export_format == "csv":
+        yield output(_csv_header())
+    query = select_product_rows().order_by(Product.id).execution_options(yield_per=chunk_size)
+    async with engine.connect() as connection:
+        result = await connection.stream(query)
+        async for rows in result.partitions(chunk_size):
+            data = output(encode(rows))
+            # the compressor buffers small inputs, an empty chunk would be sent for nothing
+            if data:
+                yield data
+    if compressor:
+        yield compressor.flush()
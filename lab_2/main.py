@@ -1,19 +1,41 @@
-import asyncio
-import json
 import uvicorn
 
 from chat import ChatRoom
-from db import session_local
+from db import async_engine, async_session_local
 from db.models import Product
+from pagination import InvalidCursor, apply_cursor, decode_cursor, encode_cursor, order_query
 from db.base import Base, engine
-from fastapi import FastAPI, HTTPException, Query, UploadFile, File, WebSocket, WebSocketDisconnect
+from batch import BatchError, check_ids, check_patches, delete_many, parse_ids, select_many, update_many
+from bulk_import import ImportFormatError, import_products
+from product_cache import ProductCache, product_to_dict
+from search import build_search_query, ensure_search_indexes
+from export import EXPORT_MEDIA_TYPES, export_products
+from versioning import TableVersionCache, ensure_version_triggers, etag_matches, make_etag, select_version
+from responses import (
+    ImportResult,
+    JSONBytesResponse,
+    PRODUCT_COLUMNS,
+    ProductOut,
+    ProductPage,
+    ProductsByIds,
+    SearchPage,
+    dump_json,
+    row_to_dict,
+    rows_to_dicts,
+    select_product_rows,
+)
+from fastapi import FastAPI, HTTPException, Query, Body, Header, Response, UploadFile, File, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from pydantic import BaseModel, ValidationError
+from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel
 from threading import Thread
+from typing import Literal
 
 
 app = FastAPI()
+product_cache = ProductCache()
+product_version_cache = TableVersionCache()
 chat_app = FastAPI()
 chat_manager = ChatRoom()
 
@@ -21,6 +43,14 @@ chat_manager = ChatRoom()
 @app.on_event("startup")
 async def startup():
     Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        ensure_search_indexes(connection)
+        ensure_version_triggers(connection)
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await async_engine.dispose()
 
 
 class ProductCreate(BaseModel):
@@ -29,6 +59,13 @@ class ProductCreate(BaseModel):
     specifications: str | None = None
 
 
+class ProductPatch(BaseModel):
+    id: int
+    name: str | None = None
+    price: float | None = None
+    specifications: str | None = None
+
+
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -37,98 +74,244 @@ async def get_chat_page():
     return FileResponse("static/index.html")
 
 
-@app.post("/products/")
-def create_product(
+@app.post("/products/", response_model=ProductOut)
+async def create_product(
     product: ProductCreate,
 ):
-    with session_local() as session:
+    async with async_session_local() as session:
         db_product = Product(**product.model_dump())
         session.add(db_product)
-        session.commit()
+        await session.commit()
+        product_cache.invalidate()
         return db_product
 
 
-@app.post("/products/import")
+@app.post("/products/import", response_model=ImportResult)
 async def upload_products(file: UploadFile = File(...)):
     if file.content_type != "application/json":
         raise HTTPException(status_code=400, detail="Only JSON files are allowed")
 
-    contents = await file.read()
-
+    # the upload is parsed while it is read and written in bounded transactions,
+    # invalid rows are reported in "errors" instead of failing the whole import
     try:
-        data = json.loads(contents.decode("utf-8"))
-    except json.JSONDecodeError:
-        raise HTTPException(status_code=400, detail="Invalid JSON")
+        result = await run_in_threadpool(import_products, engine, file.file.read, ProductCreate)
+    except ImportFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        # earlier transactions of a failed import stay committed
+        product_cache.clear()
 
-    if not isinstance(data, list):
-        raise HTTPException(status_code=400, detail="Expected a list of products")
+    return JSONBytesResponse(dump_json({"message": f"Successfully added {result['imported']} products.", **result}))
 
-    products_to_add = []
-    for item in data:
-        try:
-            product = ProductCreate(**item)
-            products_to_add.append(product)
-        except ValidationError as e:
-            raise HTTPException(
-                status_code=400, detail=f"Invalid product data: {e.errors()}"
-            )
 
-    with session_local() as session:
-        db_products = [Product(**product.model_dump()) for product in products_to_add]
-        session.add_all(db_products)
-        session.commit()
+@app.get("/cache/stats")
+async def get_cache_stats():
+    return product_cache.stats()
 
-    return {"message": f"Successfully added {len(products_to_add)} products."}
 
-
-@app.get("/products/")
-def get_products(
+@app.get("/products/", response_model=ProductPage | ProductsByIds)
+async def get_products(
     offset: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
+    after: str | None = None,
+    order_by: Literal["id", "price"] = "id",
+    ids: str | None = None,
+    if_none_match: str | None = Header(None),
+):
+    # with ?ids= the other parameters are ignored and the response is a ProductsByIds
+    if ids is not None:
+        return await get_products_by_ids(ids)
+    query = order_query(select_product_rows(), order_by)
+    if after is not None:
+        # keyset mode, `offset` is ignored and the cost does not grow with the page depth
+        try:
+            query = apply_cursor(query, order_by, decode_cursor(after, order_by))
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    else:
+        query = query.offset(offset)
+
+    async def load():
+        async with async_session_local() as session:
+            rows = (await session.execute(query.limit(limit))).all()
+        next_cursor = encode_cursor(order_by, rows[-1]) if len(rows) == limit else None
+        return dump_json({"items": rows_to_dicts(rows), "offset": offset, "limit": limit, "next_cursor": next_cursor})
+
+    version = await product_version()
+    etag = make_etag("products", version)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    # the cache holds encoded bodies, a hit is answered without serializing anything;
+    # keyed by the version so a body is never sent with the ETag of another version
+    body = await product_cache.get_or_load(("list", version, offset, limit, after, order_by), load)
+    return JSONBytesResponse(body, headers={"ETag": etag})
+
+
+async def product_version():
+    """Change counter of the product table.
+
+    Read with a primary key lookup at most every TABLE_VERSION_TTL seconds and after every write of
+    this process. Writes of other workers or nodes can take up to the TTL to change the ETags and
+    cache keys, in exchange cache hits do not touch the database.
+    """
+    async def load():
+        async with async_session_local() as session:
+            return await session.scalar(select_version("product"))
+
+    return await product_version_cache.get(product_cache.generation, load)
+
+
+async def get_products_by_ids(ids):
+    """Multi-get of ?ids=1,2,3 with one SELECT, the items keep the order of the ids"""
+    try:
+        ids = parse_ids(ids)
+    except BatchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    async with async_session_local() as session:
+        products = {row.id: row_to_dict(row) for row in (await session.execute(select_many(ids))).all()}
+    return JSONBytesResponse(dump_json({
+        "items": [products[product_id] for product_id in ids if product_id in products],
+        "missing": [product_id for product_id in ids if product_id not in products],
+    }))
+
+
+@app.patch("/products/")
+async def update_products(
+    patches: list[ProductPatch],
+):
+    """Apply partial updates to many products with a single UPDATE, returns the result of every id"""
+    try:
+        patches = check_patches([patch.model_dump(exclude_unset=True) for patch in patches])
+    except BatchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    async with async_session_local() as session:
+        products = (await session.scalars(update_many(patches))).all()
+        updated = {product.id: product_to_dict(product) for product in products}
+        await session.commit()
+    product_cache.invalidate(*updated)
+    return {
+        "results": [
+            {"id": product_id, "status": "updated", "product": updated[product_id]}
+            if product_id in updated else {"id": product_id, "status": "not_found"}
+            for product_id in patches
+        ]
+    }
+
+
+@app.delete("/products/")
+async def delete_products(
+    ids: list[int] = Body(...),
 ):
-    with session_local() as session:
-        products = session.query(Product).offset(offset).limit(limit).all()
-        return {"items": products, "offset": offset, "limit": limit}
+    """Delete many products with a single DELETE, returns the result of every id"""
+    try:
+        ids = check_ids(ids)
+    except BatchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    async with async_session_local() as session:
+        deleted = set((await session.scalars(delete_many(ids))).all())
+        await session.commit()
+    product_cache.invalidate(*deleted)
+    return {
+        "results": [
+            {"id": product_id, "status": "deleted" if product_id in deleted else "not_found"}
+            for product_id in ids
+        ]
+    }
+
+
+@app.get("/products/search", response_model=SearchPage)
+async def search_products(
+    min_price: float | None = Query(None, ge=0),
+    max_price: float | None = Query(None, ge=0),
+    q: str | None = Query(None, max_length=200),
+    mode: Literal["substring", "fulltext"] = "substring",
+    sort: Literal["id", "price", "-price", "name", "relevance"] = "id",
+    offset: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+):
+    version = await product_version()
+    try:
+        query = build_search_query(async_engine.dialect.name, min_price, max_price, q, mode, sort)
+        query = query.with_only_columns(*PRODUCT_COLUMNS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def load():
+        async with async_session_local() as session:
+            rows = (await session.execute(query.offset(offset).limit(limit))).all()
+        return dump_json({"items": rows_to_dicts(rows), "offset": offset, "limit": limit})
 
+    # stored as a list page so every write of this process invalidates it, the version covers other processes
+    key = ("list", "search", version, min_price, max_price, q, mode, sort, offset, limit)
+    return JSONBytesResponse(await product_cache.get_or_load(key, load))
 
-@app.get("/products/{product_id}")
-def get_product(
+
+@app.get("/products/export")
+async def export_product_table(
+    export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    gzip: bool = False,
+):
+    """Stream the whole product table, for dumps that would otherwise page through GET /products/"""
+    headers = {"Content-Disposition": f'attachment; filename="products.{export_format}"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        export_products(async_engine, export_format, gzip),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers=headers,
+    )
+
+
+@app.get("/products/{product_id}", response_model=ProductOut)
+async def get_product(
     product_id: int,
+    if_none_match: str | None = Header(None),
 ):
-    with session_local() as session:
-        product = session.query(Product).filter(Product.id == product_id).first()
-        if not product:
-            raise HTTPException(status_code=404, detail="Product not found")
-        return product
+    version = await product_version()
+    etag = make_etag("products", version)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    async def load():
+        async with async_session_local() as session:
+            row = (await session.execute(select_product_rows().where(Product.id == product_id))).first()
+            return dump_json(row_to_dict(row)) if row else None
+
+    body = await product_cache.get_or_load(("product", product_id, version), load)
+    if body is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return JSONBytesResponse(body, headers={"ETag": etag})
 
 
-@app.put("/products/{product_id}")
-def update_product(
+@app.put("/products/{product_id}", response_model=ProductOut)
+async def update_product(
     product_id: int,
     product: ProductCreate,
 ):
-    with session_local() as session:
-        db_product = session.query(Product).filter(Product.id == product_id).first()
+    async with async_session_local() as session:
+        db_product = await session.get(Product, product_id)
         if not db_product:
             raise HTTPException(status_code=404, detail="Product not found")
         # Convert the Pydantic model to a dictionary
         product_data = product.dict(exclude_unset=True)
         for key, value in product_data.items():
             setattr(db_product, key, value)
-        session.commit()
+        await session.commit()
+        product_cache.invalidate(product_id)
         return db_product
 
 
 @app.delete("/products/{product_id}")
-def delete_product(
+async def delete_product(
     product_id: int,
 ):
-    with session_local() as session:
-        product = session.query(Product).filter(Product.id == product_id).first()
+    async with async_session_local() as session:
+        product = await session.get(Product, product_id)
         if not product:
             raise HTTPException(status_code=404, detail="Product not found")
-        session.delete(product)
-        session.commit()
+        await session.delete(product)
+        await session.commit()
+        product_cache.invalidate(product_id)
         return {"message": "Product deleted"}
 
 
@@ -0,0 +1,26 @@
+"""add product price id index
+
+Revision ID: 3b7d9e2a41c5
+Revises: ca1fccf60f82
+Create Date: 2026-10-18 10:12:40.218734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7d9e2a41c5'
+down_revision: Union[str, None] = 'ca1fccf60f82'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # supports the keyset pagination of GET /products/?order_by=price, the id ordering uses the primary key
+    op.create_index('ix_product_price_id', 'product', ['price', 'id'], unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_product_price_id', table_name='product', if_exists=True)
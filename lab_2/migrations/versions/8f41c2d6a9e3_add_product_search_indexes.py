@@ -0,0 +1,64 @@
+"""add product search indexes
+
+Revision ID: 8f41c2d6a9e3
+Revises: 3b7d9e2a41c5
+Create Date: 2026-10-18 12:03:51.774102
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8f41c2d6a9e3'
+down_revision: Union[str, None] = '3b7d9e2a41c5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # price ranges are served by ix_product_price_id, which leads with price
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.create_index(
+            'ix_product_name_trgm', 'product', ['name'], unique=False, if_not_exists=True,
+            postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'},
+        )
+        op.create_index(
+            'ix_product_name_tsv', 'product', [sa.text("to_tsvector('simple'::regconfig, name)")],
+            unique=False, if_not_exists=True, postgresql_using='gin',
+        )
+    elif dialect == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS product_fts USING fts5("
+            "name, content='product', content_rowid='id', tokenize='trigram')"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS product_fts_insert AFTER INSERT ON product BEGIN "
+            "INSERT INTO product_fts (rowid, name) VALUES (new.id, new.name); END"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS product_fts_delete AFTER DELETE ON product BEGIN "
+            "INSERT INTO product_fts (product_fts, rowid, name) VALUES ('delete', old.id, old.name); END"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS product_fts_update AFTER UPDATE OF name ON product BEGIN "
+            "INSERT INTO product_fts (product_fts, rowid, name) VALUES ('delete', old.id, old.name); "
+            "INSERT INTO product_fts (rowid, name) VALUES (new.id, new.name); END"
+        )
+        op.execute("INSERT INTO product_fts (product_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.drop_index('ix_product_name_tsv', table_name='product', if_exists=True)
+        op.drop_index('ix_product_name_trgm', table_name='product', if_exists=True)
+    elif dialect == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS product_fts_update")
+        op.execute("DROP TRIGGER IF EXISTS product_fts_delete")
+        op.execute("DROP TRIGGER IF EXISTS product_fts_insert")
+        op.execute("DROP TABLE IF EXISTS product_fts")
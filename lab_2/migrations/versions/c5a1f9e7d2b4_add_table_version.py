@@ -0,0 +1,62 @@
+"""add table version
+
+Revision ID: c5a1f9e7d2b4
+Revises: 8f41c2d6a9e3
+Create Date: 2026-10-18 14:26:08.530417
+
+"""
+import time
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5a1f9e7d2b4'
+down_revision: Union[str, None] = '8f41c2d6a9e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('table_version',
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    # counters start at the current time so the ETags of a recreated table do not repeat
+    op.execute(
+        sa.text("INSERT INTO table_version (name, version) VALUES ('product', :version)")
+        .bindparams(version=int(time.time() * 1000))
+    )
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute(
+            # the bulk import turns the bump off for its transactions and bumps once before each commit
+            "CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$ BEGIN "
+            "IF current_setting('app.defer_table_version', true) IS DISTINCT FROM 'on' THEN "
+            "UPDATE table_version SET version = version + 1 WHERE name = TG_TABLE_NAME; END IF; RETURN NULL; "
+            "END $$ LANGUAGE plpgsql"
+        )
+        op.execute(
+            "CREATE TRIGGER product_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON product "
+            "FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()"
+        )
+    elif dialect == 'sqlite':
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            op.execute(
+                f"CREATE TRIGGER IF NOT EXISTS product_version_{event} AFTER {event} ON product BEGIN "
+                "UPDATE table_version SET version = version + 1 WHERE name = 'product'; END"
+            )
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("DROP TRIGGER IF EXISTS product_version ON product")
+        op.execute("DROP FUNCTION IF EXISTS bump_table_version()")
+    elif dialect == 'sqlite':
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            op.execute(f"DROP TRIGGER IF EXISTS product_version_{event}")
+    op.drop_table('table_version')
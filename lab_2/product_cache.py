@@ -0,0 +1,115 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+
+PRODUCT_CACHE_SIZE = int(os.getenv("PRODUCT_CACHE_SIZE", 1024))
+PRODUCT_CACHE_TTL = float(os.getenv("PRODUCT_CACHE_TTL", 30))
+
+
+def product_to_dict(product):
+    """Plain copy of a Product instance that stays valid after its session is closed"""
+    return {
+        "id": product.id,
+        "name": product.name,
+        "price": product.price,
+        "specifications": product.specifications,
+    }
+
+
+class ProductCache:
+    """LRU cache with a TTL for single products and list pages, used from the event loop.
+
+    Concurrent misses for the same key share one load (single-flight). Loads that were
+    running while the cache got invalidated still answer their callers but are not stored.
+    """
+
+    def __init__(self, max_size=PRODUCT_CACHE_SIZE, ttl=PRODUCT_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.inflight = {}
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidations = 0
+
+    async def get_or_load(self, key, load):
+        """Return the cached value of `key` or await `load()` for it, None results are not cached"""
+        entry = self.entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self.entries[key]
+
+        future = self.inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # the request that was loading got cancelled, not this one
+                if future.cancelled():
+                    return await self.get_or_load(key, load)
+                raise
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = future
+        generation = self.generation
+        try:
+            value = await load()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # the waiters get the exception, mark it retrieved when there are none
+            future.exception()
+            raise
+        finally:
+            if self.inflight.get(key) is future:
+                del self.inflight[key]
+        future.set_result(value)
+        if value is not None and generation == self.generation:
+            self._store(key, value)
+        return value
+
+    def _store(self, key, value):
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, *product_ids):
+        """Drop every list page and the products `product_ids`"""
+        self.generation += 1
+        self.invalidations += 1
+        # new requests must not join loads that may have read the old rows
+        self.inflight = {}
+        product_ids = set(product_ids)
+        for key in [key for key in self.entries if key[0] == "list" or (key[0] == "product" and key[1] in product_ids)]:
+            del self.entries[key]
+
+    def clear(self):
+        self.generation += 1
+        self.invalidations += 1
+        self.inflight = {}
+        self.entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "invalidations": self.invalidations,
+            "hit_ratio": (self.hits + self.coalesced) / lookups if lookups else None,
+        }
@@ -0,0 +1,70 @@
+import orjson
+from fastapi import Response
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import select
+
+from db.models import Product
+
+# the product endpoints select these columns as plain row tuples instead of ORM instances
+PRODUCT_FIELDS = ("id", "name", "price", "specifications")
+PRODUCT_COLUMNS = tuple(getattr(Product, field) for field in PRODUCT_FIELDS)
+
+
+class ProductOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    name: str
+    price: float
+    specifications: str | None = None
+
+
+class ProductPage(BaseModel):
+    items: list[ProductOut]
+    offset: int
+    limit: int
+    next_cursor: str | None = None
+
+
+class ProductsByIds(BaseModel):
+    items: list[ProductOut]
+    missing: list[int]
+
+
+class SearchPage(BaseModel):
+    items: list[ProductOut]
+    offset: int
+    limit: int
+
+
+class ImportResult(BaseModel):
+    message: str
+    imported: int
+    failed: int
+    errors: list[dict]
+
+
+class JSONBytesResponse(Response):
+    """Response for a body that is already encoded JSON, e.g. one taken from the product cache"""
+    media_type = "application/json"
+
+
+def select_product_rows():
+    return select(*PRODUCT_COLUMNS)
+
+
+def row_to_dict(row):
+    return dict(zip(PRODUCT_FIELDS, row))
+
+
+def rows_to_dicts(rows):
+    return [row_to_dict(row) for row in rows]
+
+
+def dump_json(content):
+    """Encode a response body with orjson.
+
+    The response models above only document the endpoints, their handlers return the
+    encoded bytes so FastAPI neither validates nor runs jsonable_encoder over them.
+    """
+    return orjson.dumps(content)
@@ -0,0 +1,48 @@
+import io
+import json
+import os
+
+os.environ.setdefault("POSTGRES_URL", "sqlite://")
+
+from pydantic import BaseModel
+from sqlalchemy import create_engine, select
+
+import bulk_import
+from bulk_import import import_products
+from db.models import Product, TableVersion
+from versioning import ensure_version_triggers, select_version
+
+
+class ProductIn(BaseModel):
+    name: str | None
+    price: float
+    specifications: str | None = None
+
+
+def test_failed_batch_falls_back_to_rows(monkeypatch):
+    engine = create_engine("sqlite://")
+    Product.__table__.create(engine)
+    TableVersion.__table__.create(engine)
+    with engine.begin() as connection:
+        ensure_version_triggers(connection)
+        version = connection.execute(select_version("product")).scalar_one()
+    insert_rows = bulk_import._insert_rows
+
+    def failing_copy(connection, rows):
+        # a COPY that the database rejects raises the driver's own error, not a DBAPIError
+        if len(rows) > 1:
+            raise connection.dialect.dbapi.Error("COPY failed")
+        insert_rows(connection, rows)
+
+    monkeypatch.setattr(bulk_import, "_insert_rows", failing_copy)
+    products = [{"name": f"Laptop {idx}", "price": 100 + idx} for idx in range(5)]
+    products[2]["name"] = None
+    result = import_products(engine, io.BytesIO(json.dumps(products).encode()).read, ProductIn, batch_size=5)
+
+    assert result["imported"] == 4
+    assert result["failed"] == 1
+    assert result["errors"][0]["row"] == 2
+    assert result["errors"][0]["errors"][0]["type"] == "database_error"
+    with engine.connect() as connection:
+        assert len(connection.execute(select(Product.id)).all()) == 4
+        assert connection.execute(select_version("product")).scalar_one() > version
@@ -0,0 +1,37 @@
+import os
+
+os.environ.setdefault("POSTGRES_URL", "sqlite://")
+
+import pytest
+from sqlalchemy import create_engine, insert
+
+from db.models import Product
+from search import build_search_query, ensure_search_indexes
+
+NAMES = ["Lenovo IdeaPad 5 Pro", "Lenovo Legion 5", "Apple MacBook Air M2", "Asus Zenbook 14"]
+
+
+@pytest.fixture
+def connection():
+    engine = create_engine("sqlite://")
+    Product.__table__.create(engine)
+    with engine.begin() as connection:
+        ensure_search_indexes(connection)
+        connection.execute(insert(Product), [{"name": name, "price": 1000.0} for name in NAMES])
+        yield connection
+
+
+def names(connection, q, **kwargs):
+    return sorted(row.name for row in connection.execute(build_search_query("sqlite", q=q, mode="fulltext", **kwargs)))
+
+
+def test_fulltext_keeps_short_words(connection):
+    assert names(connection, "lenovo 5") == ["Lenovo IdeaPad 5 Pro", "Lenovo Legion 5"]
+    assert names(connection, "lenovo pro") == ["Lenovo IdeaPad 5 Pro"]
+    assert names(connection, "macbook m2") == ["Apple MacBook Air M2"]
+    assert names(connection, "macbook 5") == []
+
+
+def test_fulltext_without_indexable_words_is_rejected(connection):
+    with pytest.raises(ValueError):
+        build_search_query("sqlite", q="m2 5", mode="fulltext")
@@ -0,0 +1,116 @@
+import os
+import time
+
+from sqlalchemy import select, text, update
+
+from db.models import TableVersion
+
+# transaction local setting that makes the PostgreSQL trigger skip the bump, see defer_version_bump()
+DEFER_VERSION_SETTING = "app.defer_table_version"
+# every write to a versioned table bumps its table_version row in the same transaction,
+# so writes of other workers, the bulk import and COPY are all counted.
+# The bump locks that row until the commit, so writers of the table run one after the other
+# from their first write on. Long transactions such as the bulk import defer the bump to just before they commit.
+VERSION_TRIGGER_DDL = {
+    "postgresql": [
+        "CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$ BEGIN "
+        f"IF current_setting('{DEFER_VERSION_SETTING}', true) IS DISTINCT FROM 'on' THEN "
+        "UPDATE table_version SET version = version + 1 WHERE name = TG_TABLE_NAME; END IF; RETURN NULL; "
+        "END $$ LANGUAGE plpgsql",
+        "CREATE TRIGGER {table}_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table} "
+        "FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()",
+    ],
+    "sqlite": [
+        # SQLite only has row level triggers
+        "CREATE TRIGGER IF NOT EXISTS {table}_version_{event} AFTER {event} ON {table} BEGIN "
+        "UPDATE table_version SET version = version + 1 WHERE name = '{table}'; END",
+    ],
+}
+SQLITE_EVENTS = ("INSERT", "UPDATE", "DELETE")
+VERSIONED_TABLES = ("product",)
+# advisory lock key that serializes the trigger DDL of workers starting at the same time
+VERSION_DDL_LOCK = 0x7461626C
+# seconds a process keeps using the version it read, writes of other processes show up after at most this long
+TABLE_VERSION_TTL = float(os.getenv("TABLE_VERSION_TTL", 1.0))
+
+
+def initial_version():
+    """Start counters at the current time, a recreated table must not hand out the ETags of the old one"""
+    return int(time.time() * 1000)
+
+
+def ensure_version_triggers(connection):
+    """Create the table_version rows and the triggers that keep them up to date if they are missing.
+
+    Deployments get the triggers from the c5a1f9e7d2b4 migration. On PostgreSQL the check runs
+    under an advisory lock and the DDL, which locks the product table, only when the trigger is missing.
+    """
+    postgresql = connection.dialect.name == "postgresql"
+    if postgresql:
+        connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": VERSION_DDL_LOCK})
+    for table in VERSIONED_TABLES:
+        connection.execute(
+            text("INSERT INTO table_version (name, version) VALUES (:name, :version) ON CONFLICT (name) DO NOTHING"),
+            {"name": table, "version": initial_version()},
+        )
+        if postgresql and connection.execute(
+            text("SELECT 1 FROM pg_trigger WHERE tgname = :name"), {"name": f"{table}_version"}
+        ).first():
+            continue
+        for statement in VERSION_TRIGGER_DDL.get(connection.dialect.name, []):
+            events = SQLITE_EVENTS if "{event}" in statement else (None,)
+            for event in events:
+                connection.execute(text(statement.format(table=table, event=event)))
+
+
+def defer_version_bump(connection):
+    """Keep the PostgreSQL triggers from bumping the versions for the rest of the transaction,
+    so it does not hold the table_version lock. The transaction has to call bump_versions() before it commits.
+    SQLite locks the whole database for a write anyway, its triggers keep bumping.
+    """
+    if connection.dialect.name == "postgresql":
+        connection.execute(text("SELECT set_config(:name, 'on', true)"), {"name": DEFER_VERSION_SETTING})
+
+
+def bump_versions(connection, tables=VERSIONED_TABLES):
+    connection.execute(
+        update(TableVersion).where(TableVersion.name.in_(tables)).values(version=TableVersion.version + 1)
+    )
+
+
+def select_version(table):
+    return select(TableVersion.version).where(TableVersion.name == table)
+
+
+class TableVersionCache:
+    """Version of a table as last read from the database, so cached reads need no query.
+
+    The version is read again once it is `ttl` seconds old or when `generation` changed,
+    which callers pass as ProductCache.generation so writes of this process show up at once.
+    """
+
+    def __init__(self, ttl=TABLE_VERSION_TTL):
+        self.ttl = ttl
+        self.version = None
+        self.generation = None
+        self.expires_at = 0.0
+
+    async def get(self, generation, load):
+        if self.version is not None and generation == self.generation and time.monotonic() < self.expires_at:
+            return self.version
+        version = await load()
+        self.version, self.generation, self.expires_at = version, generation, time.monotonic() + self.ttl
+        return version
+
+
+def make_etag(table, version):
+    return f'"{table}-{version}"'
+
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match check with the weak comparison of RFC 9110.
+    "*" is not honoured, it would answer 304 before knowing whether the product exists.
+    """
+    if not if_none_match:
+        return False
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
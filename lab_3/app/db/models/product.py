@@ -1,9 +1,13 @@
-from sqlalchemy import Column, Integer, String, Float
+from sqlalchemy import Column, Integer, String, Float, Index
 from db.base import Base
 
 
 class Product(Base):
     __tablename__ = "product"
+    __table_args__ = (
+        # keyset pagination ordered by (price, id)
+        Index("ix_product_price_id", "price", "id"),
+    )
 
     id = Column(
         Integer,
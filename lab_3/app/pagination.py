@@ -0,0 +1,66 @@
+import base64
+import binascii
+import json
+import math
+
+from sqlalchemy import tuple_
+
+from db.models import Product
+
+# sort keys of GET /products/, every ordering ends with the primary key so it is total
+ORDERINGS = {
+    "id": (Product.id,),
+    "price": (Product.price, Product.id),
+}
+# types a cursor value of each sort key may have, anything else never came from encode_cursor
+CURSOR_VALUE_TYPES = {
+    "id": (int,),
+    "price": (int, float),
+}
+# product.id is a 32-bit integer column, larger values fail in the database instead of comparing
+MAX_CURSOR_ID = 2 ** 31 - 1
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(order_by, product):
+    """Opaque cursor pointing just past `product` in the `order_by` ordering"""
+    values = [getattr(product, column.key) for column in ORDERINGS[order_by]]
+    payload = json.dumps([order_by, *values], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, order_by):
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_order, *values = json.loads(payload)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise InvalidCursor("Malformed cursor")
+    if cursor_order != order_by or len(values) != len(ORDERINGS[order_by]):
+        raise InvalidCursor(f"Cursor does not belong to the {order_by} ordering")
+    if not all(_valid_cursor_value(column.key, value) for column, value in zip(ORDERINGS[order_by], values)):
+        raise InvalidCursor("Malformed cursor")
+    return values
+
+
+def _valid_cursor_value(key, value):
+    # bool is an int subclass, NaN and infinity do not compare like the column values
+    if isinstance(value, bool) or not isinstance(value, CURSOR_VALUE_TYPES[key]):
+        return False
+    if isinstance(value, float):
+        return math.isfinite(value)
+    return key != "id" or -MAX_CURSOR_ID <= value <= MAX_CURSOR_ID
+
+
+def order_query(query, order_by):
+    return query.order_by(*ORDERINGS[order_by])
+
+
+def apply_cursor(query, order_by, values):
+    """Keep only the rows after the cursor, a range scan on the ordering index instead of an OFFSET"""
+    columns = ORDERINGS[order_by]
+    if len(columns) == 1:
+        return query.filter(columns[0] > values[0])
+    return query.filter(tuple_(*columns) > tuple_(*values))
@@ -0,0 +1,121 @@
+from sqlalchemy import column, func, literal_column, select, table, text
+
+from db.models import Product
+
+# the price range uses ix_product_price_id, the name search uses these per database indexes
+SEARCH_INDEX_DDL = {
+    "postgresql": [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        "CREATE INDEX IF NOT EXISTS ix_product_name_trgm ON product USING gin (name gin_trgm_ops)",
+        "CREATE INDEX IF NOT EXISTS ix_product_name_tsv ON product USING gin (to_tsvector('simple'::regconfig, name))",
+    ],
+    "sqlite": [
+        # external content FTS5 table over product.name, kept in sync by triggers
+        "CREATE VIRTUAL TABLE IF NOT EXISTS product_fts USING fts5("
+        "name, content='product', content_rowid='id', tokenize='trigram')",
+        "CREATE TRIGGER IF NOT EXISTS product_fts_insert AFTER INSERT ON product BEGIN "
+        "INSERT INTO product_fts (rowid, name) VALUES (new.id, new.name); END",
+        "CREATE TRIGGER IF NOT EXISTS product_fts_delete AFTER DELETE ON product BEGIN "
+        "INSERT INTO product_fts (product_fts, rowid, name) VALUES ('delete', old.id, old.name); END",
+        "CREATE TRIGGER IF NOT EXISTS product_fts_update AFTER UPDATE OF name ON product BEGIN "
+        "INSERT INTO product_fts (product_fts, rowid, name) VALUES ('delete', old.id, old.name); "
+        "INSERT INTO product_fts (rowid, name) VALUES (new.id, new.name); END",
+    ],
+}
+
+SORTS = {
+    "id": (Product.id,),
+    "price": (Product.price, Product.id),
+    "-price": (Product.price.desc(), Product.id),
+    "name": (Product.name, Product.id),
+}
+
+# trigram indexes only help patterns of at least 3 characters
+MIN_INDEXED_LENGTH = 3
+
+_product_fts = table("product_fts", column("rowid"), column("name"), column("rank"))
+_TS_CONFIG = literal_column("'simple'::regconfig")
+
+
+def ensure_search_indexes(connection):
+    """Create the name search indexes of the connection's database if they are missing"""
+    statements = SEARCH_INDEX_DDL.get(connection.dialect.name, [])
+    if connection.dialect.name == "sqlite":
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = 'product_fts'")
+        ).first()
+        for statement in statements:
+            connection.execute(text(statement))
+        if not exists:
+            # index the rows that were there before the table
+            connection.execute(text("INSERT INTO product_fts (product_fts) VALUES ('rebuild')"))
+        return
+    for statement in statements:
+        connection.execute(text(statement))
+
+
+def _like_pattern(term):
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _fts_quote(text):
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _fts_words(term):
+    """Split `term` into the words the trigram index can match and the shorter ones"""
+    words = term.split()
+    return [word for word in words if len(word) >= MIN_INDEXED_LENGTH], [
+        word for word in words if len(word) < MIN_INDEXED_LENGTH
+    ]
+
+
+def build_search_query(dialect_name, min_price=None, max_price=None, q=None, mode="substring", sort="id"):
+    """Select the matching products in the requested order.
+
+    `mode` "substring" matches `q` anywhere in the name, "fulltext" matches the products
+    containing all words of `q` and allows sort="relevance".
+    """
+    query = select(Product)
+    if min_price is not None:
+        query = query.where(Product.price >= min_price)
+    if max_price is not None:
+        query = query.where(Product.price <= max_price)
+
+    relevance = None
+    term = q.strip() if q else ""
+    if term:
+        if dialect_name == "postgresql" and mode == "fulltext":
+            document = func.to_tsvector(_TS_CONFIG, Product.name)
+            ts_query = func.plainto_tsquery(_TS_CONFIG, term)
+            query = query.where(document.op("@@")(ts_query))
+            relevance = func.ts_rank(document, ts_query).desc()
+        elif dialect_name == "postgresql":
+            # ILIKE with wildcards on both sides is answered by the trigram index
+            query = query.where(Product.name.ilike(_like_pattern(term), escape="\\"))
+        elif dialect_name == "sqlite" and mode == "fulltext":
+            indexed, short = _fts_words(term)
+            if not indexed:
+                raise ValueError(f"Full-text search needs a word of at least {MIN_INDEXED_LENGTH} characters")
+            # every word quoted so it is taken literally
+            query = query.join(_product_fts, _product_fts.c.rowid == Product.id).where(
+                literal_column("product_fts").op("MATCH")(" ".join(_fts_quote(word) for word in indexed))
+            )
+            # the trigram index can not match shorter words, they are looked for in the name instead
+            for word in short:
+                query = query.where(Product.name.ilike(_like_pattern(word), escape="\\"))
+            relevance = _product_fts.c.rank
+        elif dialect_name == "sqlite" and len(term) >= MIN_INDEXED_LENGTH:
+            # with the trigram tokenizer a quoted phrase matches it as a substring, case-insensitively
+            query = query.where(Product.id.in_(
+                select(_product_fts.c.rowid).where(literal_column("product_fts").op("MATCH")(_fts_quote(term)))
+            ))
+        else:
+            query = query.where(Product.name.ilike(_like_pattern(term), escape="\\"))
+
+    if sort == "relevance":
+        if relevance is None:
+            raise ValueError("Sorting by relevance needs a full-text query")
+        return query.order_by(relevance, Product.id)
+    return query.order_by(*SORTS[sort])